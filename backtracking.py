@@ -1,70 +1,107 @@
-def has_transversal(square):
+from latinSquare import LatinSquare
+from transversalIncremental import TransversalWitness
+
+
+def free_cells(n, reduced=False):
     """
-    Checks if the given Latin square has a complete transversal.
-    A transversal is a selection of n entries (one per row and column)
-    with all symbols distinct.
+    Returns the cells generate_latin_squares fills, in the order it fills
+    them (row by row, skipping the fixed first row and, if reduced, the
+    fixed first column).
     """
-    n = len(square)
-    used_cols = [False] * n
-
-    def backtrack(row, used_symbols):
-        if row == n:
-            return True
-        for col in range(n):
-            if not used_cols[col]:
-                symbol = square[row][col]
-                if symbol in used_symbols:
-                    continue
-                used_cols[col] = True
-                used_symbols.add(symbol)
-                if backtrack(row + 1, used_symbols):
-                    return True
-                used_cols[col] = False
-                used_symbols.remove(symbol)
-        return False
-
-    return backtrack(0, set())
-
-
-def generate_latin_squares(n):
+    first_col = 1 if reduced else 0
+    return [(row, col) for row in range(1, n) for col in range(first_col, n)]
+
+
+def _fill_latin_squares(n, reduced, prefix, stop):
     """
-    Generates all Latin squares of order n (normalized so that the first row is [0,1,...,n-1])
-    using a backtracking algorithm.
+    Backtracking core shared by generate_latin_squares and
+    latin_square_prefixes: fills the free cells in order, the first ones
+    with the values in prefix, and yields the (shared, in-place) square each
+    time the first stop free cells are filled. Cells not filled yet hold 0.
     """
-    square = [[None] * n for _ in range(n)]
+    square = LatinSquare.from_cells(n, bytes(n * n))
+    symbols = square.cells
+    full = (1 << n) - 1
+    row_free = [full] * n
+    col_free = [full] * n
     # Fix the first row to reduce symmetry.
-    square[0] = list(range(n))
-
-    def valid(row, col, value):
-        # Check if 'value' already appears in this row (up to col)
-        if value in square[row][:col]:
-            return False
-        # Check the column for previous rows
-        for r in range(row):
-            if square[r][col] == value:
-                return False
-        return True
-
-    def backtrack(cell):
-        if cell == n * n:
-            # Found a complete Latin square; yield a deep copy.
-            yield [row[:] for row in square]
+    symbols[:n] = bytes(range(n))
+    row_free[0] = 0
+    for col in range(n):
+        col_free[col] ^= 1 << col
+    if reduced:
+        # Fix the first column as well.
+        for row in range(1, n):
+            symbols[row * n] = row
+            row_free[row] ^= 1 << row
+        col_free[0] = 0
+    cells = [(row, col, row * n + col) for row, col in free_cells(n, reduced)]
+
+    for (row, col, index), value in zip(cells, prefix):
+        bit = 1 << value
+        if not row_free[row] & col_free[col] & bit:
+            return
+        symbols[index] = value
+        row_free[row] ^= bit
+        col_free[col] ^= bit
+
+    def backtrack(index):
+        if index == stop:
+            yield square
             return
 
-        row, col = divmod(cell, n)
-        # If first row is already fixed, skip it.
-        if row == 0:
-            yield from backtrack(cell + 1)
-        else:
-            for value in range(n):
-                if valid(row, col, value):
-                    square[row][col] = value
-                    yield from backtrack(cell + 1)
-            # Reset the cell before backtracking further.
-            square[row][col] = None
+        row, col, cell = cells[index]
+        candidates = row_free[row] & col_free[col]
+        while candidates:
+            bit = candidates & -candidates
+            candidates ^= bit
+            symbols[cell] = bit.bit_length() - 1
+            row_free[row] ^= bit
+            col_free[col] ^= bit
+            yield from backtrack(index + 1)
+            row_free[row] ^= bit
+            col_free[col] ^= bit
+
+    yield from backtrack(len(prefix))
+
 
-    # Start from cell index n (since row 0 is already fixed)
-    yield from backtrack(n)
+def generate_latin_squares(n, reduced=False, prefix=()):
+    """
+    Generates all Latin squares of order n (normalized so that the first row is [0,1,...,n-1])
+    using a backtracking algorithm.
+
+    With reduced=True the first column is also fixed to [0,1,...,n-1], so only
+    reduced squares are generated. Every Latin square is isotopic to a reduced
+    one, so this still reaches every isotopy class while skipping (n-1)! times
+    as many squares.
+
+    If prefix is given, only squares whose first free cells (see free_cells)
+    hold those values are generated, which splits the enumeration into
+    independent parts.
+
+    The symbols still available in each row and each column are kept as
+    bitmasks, so the candidates for a cell are a single AND. Squares are
+    yielded as LatinSquare copies, a single buffer copy each.
+    """
+    stop = len(free_cells(n, reduced))
+    for square in _fill_latin_squares(n, reduced, prefix, stop):
+        # Found a complete Latin square; yield a copy.
+        yield square.copy()
+
+
+def latin_square_prefixes(n, length, reduced=False):
+    """
+    Yields, in enumeration order, every assignment of the first length free
+    cells that generate_latin_squares reaches, as a tuple of values. length
+    must be between 0 and the number of free cells.
+    """
+    free = free_cells(n, reduced)
+    if not 0 <= length <= len(free):
+        raise ValueError(f"length must be between 0 and {len(free)} for order {n}, got {length}")
+    cells = [row * n + col for row, col in free[:length]]
+    for square in _fill_latin_squares(n, reduced, (), length):
+        symbols = square.cells
+        yield tuple(symbols[cell] for cell in cells)
 
 
 def main():
@@ -74,13 +111,16 @@ def main():
     print(f"Searching for a Latin square of order {n} without a complete transversal...")
     
     count = 0
-    for latin in generate_latin_squares(n):
+    # Consecutive squares share most cells, so each transversal is repaired into the next one's.
+    witness = TransversalWitness()
+    # Every Latin square is isotopic to a reduced one, and isotopes have the same transversals.
+    for latin in generate_latin_squares(n, reduced=True):
         count += 1
         if count % 1000 == 0:
             print(f"Checked {count} Latin squares...")
-        if not has_transversal(latin):
+        if not witness.check(latin):
             print("Found a Latin square without a complete transversal:")
-            for row in latin:
+            for row in latin.tolist():
                 print(row)
             return
 
@@ -1,73 +1,6 @@
-def count_transversals(square, limit=None):
-    n = len(square)
-    used_cols = [False] * n
-    count = 0
-
-    def backtrack(row, used_symbols):
-        nonlocal count
-        # Early exit if we've exceeded the limit.
-        if limit is not None and count > limit:
-            count+=9999 # Set count to a large value so it doesn't flag as a new minuimum 
-            return
-
-        if row == n:
-            count += 1
-            return
-
-        for col in range(n):
-            if not used_cols[col]:
-                symbol = square[row][col]
-                if symbol in used_symbols:
-                    continue
-                used_cols[col] = True
-                used_symbols.add(symbol)
-                backtrack(row + 1, used_symbols)
-                used_cols[col] = False
-                used_symbols.remove(symbol)
-
-    backtrack(0, set())
-    return count
-
-
-def generate_latin_squares(n):
-    """
-    Generates all Latin squares of order n (normalized so that the first row is [0,1,...,n-1])
-    using a backtracking algorithm.
-    """
-    square = [[None] * n for _ in range(n)]
-    # Fix the first row to reduce symmetry.
-    square[0] = list(range(n))
-
-    def valid(row, col, value):
-        # Check if 'value' already appears in this row (up to col)
-        if value in square[row][:col]:
-            return False
-        # Check the column for previous rows
-        for r in range(row):
-            if square[r][col] == value:
-                return False
-        return True
-
-    def backtrack(cell):
-        if cell == n * n:
-            # Found a complete Latin square; yield a deep copy.
-            yield [row[:] for row in square]
-            return
-
-        row, col = divmod(cell, n)
-        # If first row is already fixed, skip it.
-        if row == 0:
-            yield from backtrack(cell + 1)
-        else:
-            for value in range(n):
-                if valid(row, col, value):
-                    square[row][col] = value
-                    yield from backtrack(cell + 1)
-            # Reset the cell before backtracking further.
-            square[row][col] = None
-
-    # Start from cell index n (since row 0 is already fixed)
-    yield from backtrack(n)
+from backtracking import generate_latin_squares
+from isotopy import IsotopyCache
+from transversalEngine import fastest_counter
 
 
 def main():
@@ -77,37 +10,40 @@ def main():
 
     min_transversals = 3255
     min_square = None
+    cache = IsotopyCache()
+    counter = fastest_counter()
     count = 0
 
-    for latin in generate_latin_squares(n):
+    # Transversal counts are the same across an isotopy class, and every class has a reduced square.
+    for latin in generate_latin_squares(n, reduced=True):
         count += 1
-        if count < 2000: # burn first 2000 squares, as we have precomputed this to obtain the 3255 metric (simple initial speedup)
-            continue
         if count % 1000 == 0:
             print(f"Checked {count} Latin squares...")
 
-        num_trans = count_transversals(latin, min_transversals)
+        # Isotopic squares have the same number of transversals, so each class is counted once.
+        # Counting stops as soon as the square has more transversals than the minimum (None).
+        num_trans = cache.count(latin, counter, min_transversals)
         
         # Update minimum if needed.
-        if num_trans <= min_transversals:
+        if num_trans is not None:
             min_transversals = num_trans
             min_square = latin
             print(f"New minimum found: {min_transversals} transversals")
             print("Latin square achieving this:")
-            for row in min_square:
+            for row in min_square.tolist():
                 print(row)
             print()
             # Stop if a Latin square with no transversal is found.
             if min_transversals == 0:
                 print("Found a Latin square with 0 transversals:")
-                for row in latin:
+                for row in latin.tolist():
                     print(row)
                 print()
                 return
 
     print(f"Minimum number of transversals found: {min_transversals}")
     print("Latin square achieving this:")
-    for row in min_square:
+    for row in min_square.tolist():
         print(row)
 
 
@@ -0,0 +1,185 @@
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+
+import transversalKernel
+from backtracking import generate_latin_squares
+from deltaVerification import latin_square as delta_square
+from deltaVerification import transversal_coverage
+from findTransversals import latin_square as stored_square
+from markov import generateSquare
+from markovCount import seed_square
+from transversalDecomposition import load_transversals, search_decomposition
+from transversalEngine import count_transversals, count_transversals_dp, has_transversal
+
+# Fixed order-11 reference squares shipped with the scripts.
+REFERENCE_SQUARES = {
+    "markovCount.seed_square": seed_square,
+    "findTransversals.latin_square": stored_square,
+    "deltaVerification.latin_square": delta_square,
+}
+
+# Squares taken from generate_latin_squares at each order (reduced squares).
+ENUMERATION_SQUARES = {6: 9408, 7: 20000, 8: 20000, 9: 20000}
+
+
+def measure(function, repeat, number=1):
+    """
+    Runs function repeat times and returns the sorted run times in seconds.
+    Calls too short to time alone are run number times per run, and the
+    time per call is reported.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        times.append((time.perf_counter() - start) / number)
+    return sorted(times)
+
+
+def result(times, items=None, unit=None):
+    """
+    Summarises run times: best and median seconds per run and, if items are
+    processed per run, the best rate in items per second.
+    """
+    summary = {"best": times[0], "median": statistics.median(times), "runs": len(times)}
+    if items is not None:
+        summary["rate"] = items / times[0]
+        summary["unit"] = unit
+    return summary
+
+
+def kernel_modes():
+    """The engine paths to time: pure Python, and compiled when available."""
+    modes = [("python", False)]
+    transversalKernel.enabled = True
+    if transversalKernel.load() is not None:
+        modes.append(("numba", True))
+    return modes
+
+
+def bench_engine(repeat):
+    results = {}
+    modes = kernel_modes()
+    for name, square in REFERENCE_SQUARES.items():
+        for mode, enabled in modes:
+            transversalKernel.enabled = enabled
+            # Compile (or load the compiled kernel) outside the timed runs.
+            has_transversal(square)
+            results[f"has_transversal[{mode}] {name}"] = result(measure(lambda: has_transversal(square), repeat, 1000))
+            results[f"count_transversals[{mode}] {name}"] = result(measure(lambda: count_transversals(square), repeat))
+        results[f"count_transversals_dp {name}"] = result(measure(lambda: count_transversals_dp(square), repeat))
+    transversalKernel.enabled = True
+    return results
+
+
+def bench_markov(repeat, squares=20000):
+    def run():
+        random.seed(0)
+        for _ in itertools.islice(generateSquare(seed_square), squares):
+            pass
+    return {f"generateSquare {squares} squares": result(measure(run, repeat), squares, "squares/s")}
+
+
+def bench_enumeration(repeat):
+    results = {}
+    for n, squares in ENUMERATION_SQUARES.items():
+        def run():
+            for _ in itertools.islice(generate_latin_squares(n, reduced=True), squares):
+                pass
+        results[f"generate_latin_squares order {n}"] = result(measure(run, repeat), squares, "squares/s")
+    return results
+
+
+def bench_decomposition(repeat, filename="transversals.txt"):
+    transversals = load_transversals(filename)
+
+    def run():
+        # The search prints its progress; keep it out of the report.
+        with contextlib.redirect_stdout(io.StringIO()):
+            search_decomposition(transversals)
+
+    # A single search takes several seconds, so it is only timed once.
+    return {f"search_decomposition {filename}": result(measure(run, 1))}
+
+
+def bench_delta(repeat):
+    n = len(delta_square)
+    return {"transversal_coverage deltaVerification.latin_square":
+            result(measure(lambda: transversal_coverage(n, delta_square), repeat), n * n, "cells/s")}
+
+
+BENCHMARKS = {
+    "engine": bench_engine,
+    "markov": bench_markov,
+    "enumeration": bench_enumeration,
+    "decomposition": bench_decomposition,
+    "delta": bench_delta,
+}
+
+
+def environment():
+    try:
+        import numpy
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+    try:
+        import numba
+        numba_version = numba.__version__
+    except ImportError:
+        numba_version = None
+    return {"python": sys.version.split()[0], "implementation": platform.python_implementation(),
+            "machine": platform.machine(), "processor": platform.processor(),
+            "numpy": numpy_version, "numba": numba_version,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+
+def compare(results, baseline):
+    """Prints each benchmark's best time against the baseline run."""
+    print(f"{'benchmark':64} {'baseline':>10} {'now':>10} {'speedup':>8}")
+    for name, summary in results.items():
+        old = baseline["results"].get(name)
+        if old is None:
+            print(f"{name:64} {'-':>10} {summary['best']:10.6f} {'new':>8}")
+            continue
+        print(f"{name:64} {old['best']:10.6f} {summary['best']:10.6f} {old['best'] / summary['best']:7.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the hot paths of the Latin square scripts on fixed inputs.")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), default=sorted(BENCHMARKS),
+                        help="benchmark groups to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=5, help="runs of each benchmark, the best is reported")
+    parser.add_argument("--output", default=None, help="JSON file to write the results to")
+    parser.add_argument("--compare", default=None, help="JSON file of an earlier run to compare against")
+    args = parser.parse_args()
+
+    results = {}
+    for group in args.only:
+        print(f"Running {group} benchmarks...", flush=True)
+        for name, summary in BENCHMARKS[group](args.repeat).items():
+            rate = f"  {summary['rate']:.1f} {summary['unit']}" if "rate" in summary else ""
+            print(f"  {name}: best {summary['best']:.6f}s, median {summary['median']:.6f}s{rate}", flush=True)
+            results[name] = summary
+
+    report = {"environment": environment(), "repeat": args.repeat, "results": results}
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    if args.compare is not None:
+        with open(args.compare, "r") as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
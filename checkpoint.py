@@ -0,0 +1,27 @@
+"""
+Atomic JSON checkpoints for the long-running searches.
+
+A checkpoint is written to a temporary file next to the target and moved
+over it with os.replace, so a run killed mid-write leaves the previous
+checkpoint intact.
+"""
+import json
+import os
+
+
+def save_checkpoint(filename, state):
+    tmp = f"{filename}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, filename)
+
+
+def load_checkpoint(filename):
+    """Returns the saved state, or None if there is no checkpoint."""
+    try:
+        with open(filename, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
@@ -1,85 +1,120 @@
+from transversalEngine import symbol_table
+
+
 def delta(x, y, z, n):
     diff = z-x-y
     return (diff) % n if diff > 0 else diff % -n
 
-def search_transversal_with_fixed(n, latin_square, fixed, row_list, col_avail, current, current_delta, target_delta):
+def delta_table(n, latin_square):
     """
-    Searches for a transversal that includes the fixed element.
-    
+    Returns the n x n table of delta values (mod n) of every cell.
+    """
+    return [[delta(r, c, latin_square[r][c], n) % n for c in range(n)] for r in range(n)]
+
+def search_transversal_with_fixed(n, latin_square, fixed, deltas=None):
+    """
+    Searches for a transversal that includes the fixed element, stopping at
+    the first one found.
+
     Parameters:
       n           - size of the Latin square
       latin_square- the n x n Latin square (list of lists)
-      fixed       - tuple (fx, fy, fz) representing the fixed element (already in the transversal)
-      row_list    - list of remaining row indices to process (fixed row is removed)
-      col_avail   - set of columns still available (fixed column removed)
-      current     - list of selected cells so far, each as (row, col, symbol)
-      current_delta - current sum of delta values modulo n for the chosen cells
-      target_delta- value that current_delta must equal at the end (should be -delta(fixed) mod n)
+      fixed       - tuple (fx, fy, fz) representing the fixed element
+      deltas      - optional precomputed delta_table(n, latin_square)
+
+    Returns the transversal as a list of (row, col, symbol), fixed element
+    included, or None if there is none.
+
+    In any transversal T the deltas must sum to 0 mod n. Once some cells are
+    chosen, every completion uses exactly the remaining rows, columns and
+    symbols, so the deltas of the remaining cells always sum to
+    sum(symbols) - sum(rows) - sum(cols) mod n, whichever cells are picked.
+    The residue a completion can reach is therefore known before searching,
+    and a fixed element whose residue cannot reach the target is rejected
+    without any search (this happens for every element when n is even).
     """
-    if not row_list:
-        # Base case: all rows processed.
-        # Check if the delta condition holds.
-        if current_delta % n == target_delta % n:
-            return [current.copy()]
-        else:
-            return []
-    
-    # Choose next row to assign a cell
-    solutions = []
-    row = row_list[0]
-    # Try every available column in this row.
-    for col in list(col_avail):
-        symbol = latin_square[row][col]
-        # For a proper transversal, you also need to check that the symbol hasn't been used.
-        # Here we assume current already uses distinct symbols (you can manage that similarly).
-        # For simplicity, we omit the symbol-check in this sketch.
-        
-        d = delta(row, col, symbol, n)
-        # Choose this cell
-        current.append((row, col, symbol))
-        col_avail.remove(col)
-        # Recursively process the remaining rows.
-        sols = search_transversal_with_fixed(n, latin_square,
-                                             fixed, row_list[1:], col_avail, 
-                                             current, (current_delta + d) % n, target_delta)
-        solutions.extend(sols)
-        # Backtrack
-        current.pop()
-        col_avail.add(col)
-    return solutions
-
-def transversal_exists_through_element(n, latin_square, fixed):
+    fx, fy, fz = fixed
+    if deltas is None:
+        deltas = delta_table(n, latin_square)
+    # The remaining cells must sum to -delta(fixed) mod n.
+    target_delta = -deltas[fx][fy] % n
+    rows = [r for r in range(n) if r != fx]
+    reachable = sum(s for s in range(n) if s != fz) - sum(rows) - sum(c for c in range(n) if c != fy)
+    if reachable % n != target_delta:
+        return None
+
+    # Past the check above, every completion reaches target_delta, so the
+    # search only needs distinct columns and symbols.
+    table = symbol_table(latin_square)
+    chosen = [0] * n
+    chosen[fx] = fy
+
+    def backtrack(index, free_cols, free_symbols):
+        if index == len(rows):
+            return True
+        row = rows[index]
+        bits = table[row]
+        cols = free_cols
+        while cols:
+            col = cols & -cols
+            cols ^= col
+            symbol = bits[col]
+            if not symbol & free_symbols:
+                continue
+            c = col.bit_length() - 1
+            chosen[row] = c
+            if backtrack(index + 1, free_cols ^ col, free_symbols ^ symbol):
+                return True
+        return False
+
+    full = (1 << n) - 1
+    if not backtrack(0, full ^ (1 << fy), full ^ (1 << fz)):
+        return None
+    return [(r, c, latin_square[r][c]) for r, c in enumerate(chosen)]
+
+def transversal_exists_through_element(n, latin_square, fixed, deltas=None):
     """
-    Returns True if there is at least one transversal containing the fixed element.
+    Returns True if there is at least one transversal containing the fixed
+    element whose deltas sum to 0 mod n (see search_transversal_with_fixed).
     fixed is a tuple (x, y, latin_square[x][y]).
+
+    This is the delta-constrained test, not plain transversal existence:
+    the deltas of any transversal sum to n/2 mod n when n is even, so the
+    result is always False for even n, whatever the square.
     """
-    fx, fy, fz = fixed
-    # Compute the delta for the fixed element.
-    fixed_delta = delta(fx, fy, fz, n)
-    # In any transversal T, we must have:
-    # fixed_delta + sum_{other elements} delta = 0 mod n,
-    # so the remaining elements must sum to -fixed_delta mod n.
-    target_delta = (-fixed_delta) % n
-    
-    # Prepare the list of rows to fill (exclude fx) and available columns (exclude fy)
-    row_list = [r for r in range(n) if r != fx]
-    col_avail = set(c for c in range(n) if c != fy)
-    
-    # Start with the fixed element's delta value in the accumulated sum.
-    # Actually, since we already fixed that element, the search will only sum the rest.
-    sols = search_transversal_with_fixed(n, latin_square, fixed, row_list, col_avail, [], 0, target_delta)
-    
-    return len(sols) > 0
+    return search_transversal_with_fixed(n, latin_square, fixed, deltas) is not None
+
+def transversal_coverage(n, latin_square):
+    """
+    Checks every element of the square in one pass. Each transversal found
+    covers n elements, so every element it passes through is marked at
+    once and only the elements not covered yet need their own search.
+    Returns a dict mapping (i, j) to whether a transversal whose deltas sum
+    to 0 mod n passes through it.
+
+    As in transversal_exists_through_element, this is the delta-constrained
+    test: every element maps to False when n is even.
+    """
+    deltas = delta_table(n, latin_square)
+    results = {}
+    for i in range(n):
+        for j in range(n):
+            if (i, j) in results:
+                continue
+            transversal = search_transversal_with_fixed(n, latin_square, (i, j, latin_square[i][j]), deltas)
+            if transversal is None:
+                results[(i, j)] = False
+                continue
+            for row, col, _ in transversal:
+                results[(row, col)] = True
+    return results
 
 # Example of using this test on every element:
 def test_every_element_for_transversal(n, latin_square):
-    results = {}
+    results = transversal_coverage(n, latin_square)
     for i in range(n):
         for j in range(n):
-            fixed = (i, j, latin_square[i][j])
-            exists = transversal_exists_through_element(n, latin_square, fixed)
-            results[(i,j)] = exists
-            print(f"Transversal through element ({i},{j}) exists? {exists}")
+            print(f"Transversal through element ({i},{j}) exists? {results[(i, j)]}")
     return results
 
 # Example usage:
@@ -97,4 +132,6 @@ latin_square = [
     [7, 10, 9, 5, 8, 1, 0, 3, 2, 6, 4],
     [9, 8, 4, 10, 3, 6, 2, 0, 5, 7, 1]
 ]
-test_results = test_every_element_for_transversal(n, latin_square)
\ No newline at end of file
+
+if __name__ == "__main__":
+    test_results = test_every_element_for_transversal(n, latin_square)
@@ -1,30 +1,57 @@
-def print_transversals(square):
-    n = len(square)
-    used_cols = [False] * n
-    count = 0
+import argparse
+import time
+
+from checkpoint import load_checkpoint, save_checkpoint
+from transversalEngine import iter_transversal_columns
+from transversalStore import BinarySink, TextSink, square_hash
 
-    with open('transversals.txt', 'w') as f:
-        def backtrack(row, used_symbols, current_transversal):
-            nonlocal count
-            if row == n:
-                f.write(str(current_transversal) + '\n')
-                count += 1
-                return
 
-            for col in range(n):
-                if not used_cols[col]:
-                    symbol = square[row][col]
-                    if symbol in used_symbols:
-                        continue
+def stream_transversals(square, sink, checkpoint=None, depth=1, state=None):
+    """
+    Finds all transversals of square and passes each one to sink.add as a
+    column permutation, returning the total count.
+
+    The search is split on the partial transversals of its first depth rows
+    (the search frontier), taken in order. After each of them the sink is
+    flushed and, if a checkpoint file is given, the frontier position, the
+    count and the sink position are saved there. Passing a loaded checkpoint
+    as state continues after the last completed prefix; the sink must have
+    been opened at state["position"]. depth must be between 0 and the order
+    of the square.
+    """
+    if not 0 <= depth <= len(square):
+        raise ValueError(f"depth must be between 0 and {len(square)}, got {depth}")
+    prefixes = [list(prefix) for prefix in iter_transversal_columns(square, depth=depth)]
+    digest = square_hash(square).hex()
+    done = 0
+    count = 0
+    if state is not None:
+        if state["square"] != digest or state["depth"] != depth:
+            raise ValueError("checkpoint was written for a different square or depth")
+        done = state["done"]
+        count = state["count"]
+        print(f"Resuming after {done}/{len(prefixes)} branches, {count} transversals found so far.")
 
-                    used_cols[col] = True
-                    used_symbols.add(symbol)
-                    backtrack(row + 1, used_symbols, current_transversal + [(row, col, symbol)])
-                    used_cols[col] = False
-                    used_symbols.remove(symbol)
+    start = time.time()
+    found = 0
+    for index in range(done, len(prefixes)):
+        for columns in iter_transversal_columns(square, prefixes[index]):
+            sink.add(columns)
+            found += 1
+        position = sink.flush()
+        if checkpoint is not None:
+            save_checkpoint(checkpoint, {"square": digest, "depth": depth, "done": index + 1,
+                                         "count": count + found, "position": position})
+        print(f"Finished branch {index + 1}/{len(prefixes)}: {count + found} transversals "
+              f"({found / max(time.time() - start, 1e-9):.0f}/s)")
 
-        backtrack(0, set(), [])
+    return count + found
 
+
+def print_transversals(square, filename='transversals.txt'):
+    sink = TextSink(filename, square)
+    count = stream_transversals(square, sink)
+    sink.close()
     return count
 
 
@@ -41,5 +68,28 @@ latin_square = [[0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10],
                 [7, 10, 9, 5, 8, 1, 0, 3, 2, 6, 4],
                 [9, 8, 4, 10, 3, 6, 2, 0, 5, 7, 1]]
 
+def main():
+    parser = argparse.ArgumentParser(description="Find all transversals of the Latin square.")
+    parser.add_argument("--output", default=None, help="output file (default: transversals.txt or transversals.bin)")
+    parser.add_argument("--binary", action="store_true", help="write the binary format of transversalStore.py")
+    parser.add_argument("--checkpoint", default=None, help="file to save the search frontier to after every branch")
+    parser.add_argument("--resume", action="store_true", help="continue from the checkpoint file")
+    parser.add_argument("--depth", type=int, default=1, help="rows fixed per branch of the search frontier")
+    args = parser.parse_args()
+    if not 0 <= args.depth <= len(latin_square):
+        parser.error(f"--depth must be between 0 and {len(latin_square)}")
+
+    output = args.output or ('transversals.bin' if args.binary else 'transversals.txt')
+    state = None
+    if args.resume:
+        if args.checkpoint is None:
+            parser.error("--resume needs --checkpoint")
+        state = load_checkpoint(args.checkpoint)
+    position = state["position"] if state else 0
+    sink = (BinarySink if args.binary else TextSink)(output, latin_square, position)
+    total = stream_transversals(latin_square, sink, args.checkpoint, args.depth, state)
+    sink.close()
+    print(f"Total transversals found: {total}")
+
 if __name__ == '__main__':
-    print(f"Total transversals found: {print_transversals(latin_square)}")
\ No newline at end of file
+    main()
\ No newline at end of file
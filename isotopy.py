@@ -0,0 +1,262 @@
+"""
+Isotopy invariants, canonical forms and a transversal-count cache.
+
+Permuting the rows, columns or symbols of a Latin square does not change
+its number of transversals, so squares in the same isotopy class only need
+to be counted once.
+
+For two rows p and q, the permutation of symbols taking row p to row q
+(s -> L[q][j] where L[p][j] = s) has a cycle structure that column
+permutations leave alone and symbol permutations only relabel. The multiset
+of these cycle structures over all pairs of rows is therefore a cheap
+isotopy invariant, used to screen the cache. The canonical form, computed
+only when two squares share an invariant, is the smallest square reachable
+from a set of normalisations chosen through the same cycle structures.
+"""
+import json
+from collections import OrderedDict
+from itertools import permutations, product
+from math import factorial
+
+
+def _symbol_positions(square):
+    """Returns, for each row, a list mapping a symbol to its column."""
+    positions = []
+    for row in square:
+        position = [0] * len(row)
+        for col, symbol in enumerate(row):
+            position[symbol] = col
+        positions.append(position)
+    return positions
+
+
+def _row_permutation(square, positions, p, q):
+    """The permutation of symbols taking row p to row q."""
+    row = square[q]
+    return [row[col] for col in positions[p]]
+
+
+def _cycles(permutation):
+    n = len(permutation)
+    seen = [False] * n
+    cycles = []
+    for start in range(n):
+        if seen[start]:
+            continue
+        cycle = []
+        s = start
+        while not seen[s]:
+            seen[s] = True
+            cycle.append(s)
+            s = permutation[s]
+        cycles.append(cycle)
+    return cycles
+
+
+def _cycle_type(permutation):
+    return tuple(sorted(len(cycle) for cycle in _cycles(permutation)))
+
+
+def isotopy_invariant(square):
+    """
+    Returns the sorted cycle structures of the row permutations of every
+    pair of rows. Isotopic squares always have the same invariant; squares
+    with the same invariant are usually, but not always, isotopic.
+    """
+    n = len(square)
+    positions = _symbol_positions(square)
+    return tuple(sorted(_cycle_type(_row_permutation(square, positions, p, q))
+                        for p in range(n) for q in range(p + 1, n)))
+
+
+def _labellings(cycles):
+    """
+    Yields every way of listing the symbols cycle by cycle: cycles ordered
+    by length (cycles of equal length in any order), each cycle starting
+    at any of its symbols and followed in its own direction.
+    """
+    groups = {}
+    for cycle in cycles:
+        groups.setdefault(len(cycle), []).append(cycle)
+    lengths = sorted(groups)
+    orders = [list(permutations(groups[length])) for length in lengths]
+    for chosen in product(*orders):
+        ordered = [cycle for group in chosen for cycle in group]
+        for starts in product(*(range(len(cycle)) for cycle in ordered)):
+            labelling = []
+            for cycle, start in zip(ordered, starts):
+                labelling.extend(cycle[start:] + cycle[:start])
+            yield labelling
+
+
+def _labelling_count(cycle_type):
+    count = 1
+    for length in set(cycle_type):
+        multiplicity = cycle_type.count(length)
+        count *= factorial(multiplicity) * length ** multiplicity
+    return count
+
+
+def canonical_form(square):
+    """
+    Returns the canonical form of the square's isotopy class as bytes (the
+    symbols row by row): two squares are isotopic exactly when their
+    canonical forms are equal.
+
+    A normalisation picks an ordered pair of rows (p, q) and a labelling
+    of the cycles of the permutation taking row p to row q. The symbols are
+    renamed in labelling order, the columns are ordered so that row p reads
+    0..n-1, row p becomes row 0, row q row 1 and the other rows are ordered
+    by their entry in the new first column. Only pairs of the cycle type
+    with the fewest normalisations are tried, which depends on the class
+    alone, and the smallest resulting square is the canonical form.
+    """
+    n = len(square)
+    if n <= 1:
+        return bytes([n]) + bytes(symbol for row in square for symbol in row)
+    positions = _symbol_positions(square)
+
+    pairs = {}
+    for p in range(n):
+        for q in range(n):
+            if p != q:
+                permutation = _row_permutation(square, positions, p, q)
+                pairs.setdefault(_cycle_type(permutation), []).append((p, q, permutation))
+    cycle_type = min(pairs, key=lambda t: (len(pairs[t]) * _labelling_count(t), t))
+
+    best = None
+    for p, q, permutation in pairs[cycle_type]:
+        columns = positions[p]
+        for labelling in _labellings(_cycles(permutation)):
+            label = [0] * n
+            for index, symbol in enumerate(labelling):
+                label[symbol] = index
+            order = [columns[symbol] for symbol in labelling]
+            first = order[0]
+            rows = [p, q] + sorted((r for r in range(n) if r != p and r != q),
+                                   key=lambda r: label[square[r][first]])
+            form = bytes(label[square[r][col]] for r in rows for col in order)
+            if best is None or form < best:
+                best = form
+    return bytes([n]) + best
+
+
+class IsotopyCache:
+    """
+    LRU cache from isotopy classes to transversal counts.
+
+    Squares are grouped by a hash of isotopy_invariant (an int costs far
+    less to keep than the invariant tuple). A square whose hash has not
+    been seen is a miss straight away; otherwise canonical forms are
+    compared, computed only then and kept with the entries, so colliding
+    invariants are told apart. At most maxsize hashes are kept, each
+    costing a few hundred bytes. If filename is given, the cache is loaded
+    from it and save() writes it back, so counts persist between runs.
+
+    A class whose count was only found to exceed some limit is kept with
+    that lower bound, which still answers later queries with a limit below
+    it.
+    """
+
+    def __init__(self, maxsize=10000, filename=None):
+        self.maxsize = maxsize
+        self.filename = filename
+        self.hits = 0
+        self.misses = 0
+        # hash(invariant) -> list of [square bytes, canonical form or None, count, exact]
+        # where, when exact is False, the real count is at least count (limit + 1)
+        self._entries = OrderedDict()
+        if filename is not None:
+            self.load()
+
+    def _find(self, square):
+        invariant = hash(isotopy_invariant(square))
+        entries = self._entries.get(invariant)
+        if entries is None:
+            return invariant, None, None
+        self._entries.move_to_end(invariant)
+        form = canonical_form(square)
+        for entry in entries:
+            if entry[1] is None:
+                entry[1] = canonical_form(_unflatten(entry[0]))
+            if entry[1] == form:
+                return invariant, form, entry
+        return invariant, form, None
+
+    def get(self, square):
+        """Returns the cached transversal count of the square's class, or None."""
+        _, _, entry = self._find(square)
+        if entry is None or not entry[3]:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[2]
+
+    def put(self, square, count):
+        invariant, form, entry = self._find(square)
+        self._store(square, invariant, form, entry, count, True)
+
+    def count(self, square, counter, limit=None):
+        """
+        Returns the transversal count of the square's class from the cache,
+        or computes it with counter(square) and caches it.
+
+        If limit is given, None is returned when the count is larger than
+        limit, and counter is called as counter(square, limit=limit), which
+        may return None to say so without counting in full.
+        """
+        invariant, form, entry = self._find(square)
+        if entry is not None:
+            count, exact = entry[2], entry[3]
+            if exact or (limit is not None and count > limit):
+                self.hits += 1
+                return count if limit is None or count <= limit else None
+        self.misses += 1
+        if limit is None:
+            count = counter(square)
+        else:
+            count = counter(square, limit=limit)
+        if count is None:
+            self._store(square, invariant, form, entry, limit + 1, False)
+        else:
+            self._store(square, invariant, form, entry, count, True)
+        return count
+
+    def _store(self, square, invariant, form, entry, count, exact):
+        if entry is not None:
+            entry[2] = count
+            entry[3] = exact
+            return
+        flat = bytes([len(square)]) + bytes(symbol for row in square for symbol in row)
+        self._entries.setdefault(invariant, []).append([flat, form, count, exact])
+        self._entries.move_to_end(invariant)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return sum(len(entries) for entries in self._entries.values())
+
+    def load(self):
+        try:
+            with open(self.filename, "r") as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            return
+        for flat, form, count, *exact in saved:
+            square = _unflatten(bytes.fromhex(flat))
+            invariant = hash(isotopy_invariant(square))
+            # Files written before lower bounds were kept hold exact counts only.
+            self._entries.setdefault(invariant, []).append(
+                [bytes.fromhex(flat), bytes.fromhex(form) if form else None, count, exact[0] if exact else True])
+
+    def save(self):
+        saved = [[flat.hex(), form.hex() if form else None, count, exact]
+                 for entries in self._entries.values() for flat, form, count, exact in entries]
+        with open(self.filename, "w") as f:
+            json.dump(saved, f)
+
+
+def _unflatten(flat):
+    n = flat[0]
+    return [list(flat[1 + r * n:1 + (r + 1) * n]) for r in range(n)]
+
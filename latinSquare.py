@@ -0,0 +1,149 @@
+"""
+Compact array-backed Latin square.
+
+A LatinSquare keeps its n * n symbols row by row in one bytearray (the rcs
+form: cells[r * n + c] is the symbol in row r, column c). Indexing gives
+the rows as memoryviews of that buffer, so code written for lists of lists
+(square[r][c], len(square), iterating over rows) accepts a LatinSquare
+without converting it, and copying one is a single buffer copy.
+
+The cer and erc conjugates (the row holding each symbol in each column and
+the column holding each symbol in each row) are built on first use and
+dropped whenever a cell is changed through set().
+"""
+
+
+class LatinSquare:
+    __slots__ = ("n", "cells", "_rows", "_cer", "_erc")
+
+    def __init__(self, rows):
+        """Builds a square from a sequence of rows (or another LatinSquare)."""
+        if isinstance(rows, LatinSquare):
+            self.n = rows.n
+            self.cells = bytearray(rows.cells)
+        else:
+            self.n = len(rows)
+            self.cells = bytearray(symbol for row in rows for symbol in row)
+            if len(self.cells) != self.n * self.n:
+                raise ValueError("a Latin square needs n rows of n symbols")
+        self._rows = None
+        self._cer = None
+        self._erc = None
+
+    @classmethod
+    def from_cells(cls, n, cells):
+        """Builds a square of order n from its n * n symbols, row by row."""
+        square = cls.__new__(cls)
+        square.n = n
+        square.cells = bytearray(cells)
+        if len(square.cells) != n * n:
+            raise ValueError(f"expected {n * n} symbols, got {len(square.cells)}")
+        square._rows = None
+        square._cer = None
+        square._erc = None
+        return square
+
+    def _row_views(self):
+        if self._rows is None:
+            n = self.n
+            view = memoryview(self.cells)
+            self._rows = tuple(view[r * n:(r + 1) * n] for r in range(n))
+        return self._rows
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, row):
+        return self._row_views()[row]
+
+    def __iter__(self):
+        return iter(self._row_views())
+
+    def __buffer__(self, flags):
+        return memoryview(self.cells)
+
+    def __eq__(self, other):
+        if not isinstance(other, LatinSquare):
+            return NotImplemented
+        return self.n == other.n and self.cells == other.cells
+
+    def __hash__(self):
+        # Hashes the current contents: do not change a square used as a key.
+        return hash((self.n, bytes(self.cells)))
+
+    def __repr__(self):
+        return f"LatinSquare({self.tolist()})"
+
+    def __reduce__(self):
+        return (LatinSquare.from_cells, (self.n, bytes(self.cells)))
+
+    def copy(self):
+        return LatinSquare.from_cells(self.n, self.cells)
+
+    __copy__ = copy
+
+    def tolist(self):
+        """Returns the square as a list of lists of ints."""
+        n = self.n
+        cells = self.cells
+        return [list(cells[r * n:(r + 1) * n]) for r in range(n)]
+
+    def set(self, row, col, symbol):
+        """Writes one cell and drops the conjugates, which are rebuilt when next used."""
+        self.cells[row * self.n + col] = symbol
+        self._cer = None
+        self._erc = None
+
+    @property
+    def cer(self):
+        """bytearray with cer[c * n + e] the row holding symbol e in column c."""
+        if self._cer is None:
+            self._build_conjugates()
+        return self._cer
+
+    @property
+    def erc(self):
+        """bytearray with erc[e * n + r] the column holding symbol e in row r."""
+        if self._erc is None:
+            self._build_conjugates()
+        return self._erc
+
+    def _build_conjugates(self):
+        n = self.n
+        cer = bytearray(n * n)
+        erc = bytearray(n * n)
+        for index, symbol in enumerate(self.cells):
+            r, c = divmod(index, n)
+            cer[c * n + symbol] = r
+            erc[symbol * n + r] = c
+        self._cer = cer
+        self._erc = erc
+
+    def row_of(self, col, symbol):
+        """Returns the row holding symbol in column col."""
+        return self.cer[col * self.n + symbol]
+
+    def col_of(self, symbol, row):
+        """Returns the column holding symbol in row row."""
+        return self.erc[symbol * self.n + row]
+
+    def is_latin(self):
+        """Checks that every row and every column holds each symbol once."""
+        n = self.n
+        full = (1 << n) - 1
+        cells = self.cells
+        for r in range(n):
+            seen = 0
+            for symbol in cells[r * n:(r + 1) * n]:
+                if symbol >= n:
+                    return False
+                seen |= 1 << symbol
+            if seen != full:
+                return False
+        for c in range(n):
+            seen = 0
+            for symbol in cells[c::n]:
+                seen |= 1 << symbol
+            if seen != full:
+                return False
+        return True
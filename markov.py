@@ -1,82 +1,61 @@
+import argparse
 import random
+import time
+from array import array
+
+import metrics
+from checkpoint import load_checkpoint, save_checkpoint
+from transversalIncremental import TransversalWitness
 
 # Order of the Latin Square to be checked
 n=11
 
-def has_transversal(square):
+def row_containing_sym(L_cer, c, x):
     """
-    Checks if the given Latin square has a complete transversal.
-    A transversal is a selection of n entries (one per row and column)
-    with all symbols distinct.
+    Picks uniformly one of the two rows holding symbol x in column c
+    (only called in the improper state, where column c holds x twice).
     """
-    n = len(square)
-    used_cols = [False] * n
-
-    def backtrack(row, used_symbols):
-        if row == n:
-            return True
-        for col in range(n):
-            if not used_cols[col]:
-                symbol = square[row][col]
-                if symbol in used_symbols:
-                    continue
-                used_cols[col] = True
-                used_symbols.add(symbol)
-                if backtrack(row + 1, used_symbols):
-                    return True
-                used_cols[col] = False
-                used_symbols.remove(symbol)
-        return False
-
-    return backtrack(0, set())
-
-def row_containing_sym(L, c, x):
-    r1 = -1
-    r2 = -1
-
-    for r in range(n):
-        if r1 >= 0 and r2 >= 0:
-            break
-
-        if L[r][c] == x and r1 < 0:
-            r1 = r
-            continue
+    rows = L_cer[c][x]
+    r1 = rows & -rows
+    r2 = rows ^ r1
+    assert r1 and r2 and not r2 & (r2 - 1)
 
-        if L[r][c] == x and r2 < 0:
-            r2 = r
-            break
-
-    assert r1 >= 0 and r2 >= 0
-
-    return r1 if (random.random() < 0.5) else r2
-
-def column_containing_sym(L, r, x):
-    c1 = -1
-    c2 = -1
-
-    for c in range(n):
-        if c1 >= 0 and c2 >= 0:
-            break
+    return (r1 if (random.random() < 0.5) else r2).bit_length() - 1
 
-        if L[r][c] == x and c1 < 0:
-            c1 = c
-            continue
-
-        if L[r][c] == x and c2 < 0:
-            c2 = c
-            break
-
-    assert c1 >= 0 and c2 >= 0
+def column_containing_sym(L_erc, r, x):
+    """
+    Picks uniformly one of the two columns holding symbol x in row r
+    (only called in the improper state, where row r holds x twice).
+    """
+    cols = L_erc[x][r]
+    c1 = cols & -cols
+    c2 = cols ^ c1
+    assert c1 and c2 and not c2 & (c2 - 1)
 
-    return c1 if (random.random() < 0.5) else c2
+    return (c1 if (random.random() < 0.5) else c2).bit_length() - 1
 
-def generateSquare(L_start):
+def generateSquare(L_start, burn_in=0, thin=1):
     """Generator for a sequence of uniformly distributed latin squares,
     given L_start as the initial latin square.
 
     This code implements the Markov chain algorithm of Jacobson and Matthews (1996), 
     based on the sagemath implementation in Python.
 
+    Consecutive proper squares differ by a single move, so burn_in proper
+    squares (the starting square included) can be discarded before the
+    first one is yielded, and after that only every thin-th proper square
+    is yielded. The defaults yield every square, starting with L_start.
+    The same list is yielded each time and modified in place afterwards.
+    While metrics are enabled, the moves and proper squares since the last
+    yield are recorded each time a square is yielded.
+
+    The conjugates are kept as indexes alongside the square: L_cer[c][e] is
+    the bitmask of rows holding symbol e in column c and L_erc[e][r] the
+    bitmask of columns holding symbol e in row r. Every cell write updates
+    them in place, so a move costs O(1) instead of an O(n^2) rebuild, and
+    they stay valid in the improper state, where a symbol appears twice in
+    one row and column.
+
     REFERENCES:
 
     Mark T. Jacobson and Peter Matthews, "Generating uniformly
@@ -85,27 +64,47 @@ def generateSquare(L_start):
     The SageMath Developers. (2025). SageMath (Version 10.7.beta0) [Computer software].
     https://doi.org/10.5281/zenodo.8042260"""
     
+    n = len(L_start)
     r1 = r2 = c1 = c2 = x = y = z = -1
     proper = True
+    skip = burn_in
+    moves = proper_squares = 0
 
-    from copy import copy
-    L = copy(L_start)
+    L = [list(row) for row in L_start]
 
-    L_cer = [[None] * n for _ in range(n)]
-    L_erc = [[None] * n for _ in range(n)]
+    L_cer = [[0] * n for _ in range(n)]
+    L_erc = [[0] * n for _ in range(n)]
+    for r in range(n):
+        for c in range(n):
+            e = L[r][c]
 
-    while True:
-        if proper:
-            # Update the other two conjugates
-            for r in range(n):
-                for c in range(n):
-                    e = L[r][c]
+            L_cer[c][e] |= 1 << r
+            L_erc[e][r] |= 1 << c
 
-                    L_cer[c][e] = r
-                    L_erc[e][r] = c
+    def set_cell(r, c, e):
+        row = L[r]
+        old = row[c]
+        L_cer[c][old] ^= 1 << r
+        L_erc[old][r] ^= 1 << c
 
-            yield L
+        row[c] = e
+        L_cer[c][e] |= 1 << r
+        L_erc[e][r] |= 1 << c
 
+    while True:
+        if proper:
+            proper_squares += 1
+            if skip > 0:
+                skip -= 1
+            else:
+                if metrics.enabled:
+                    metrics.add("chain_moves_total", moves)
+                    metrics.add("chain_proper_squares_total", proper_squares)
+                moves = proper_squares = 0
+                yield L
+                skip = thin - 1
+
+            moves += 1
             r1 = random.randint(0, n-1)
             c1 = random.randint(0, n-1)
             x = L[r1][c1]
@@ -114,20 +113,20 @@ def generateSquare(L_start):
             while y == x:
                 y = random.randint(0, n-1)
 
+            # The square is proper, so each of these masks has a single bit.
+            c2 = L_erc[y][r1].bit_length() - 1
+            r2 = L_cer[c1][y].bit_length() - 1
 
-            c2 = L_erc[y][r1]
-            r2 = L_cer[c1][y]
-
-            L[r1][c1] = y
-            L[r1][c2] = x
-            L[r2][c1] = x
+            set_cell(r1, c1, y)
+            set_cell(r1, c2, x)
+            set_cell(r2, c1, x)
 
             # Now deal with the unknown point.
             # We want to form z + (y - x)
             z = L[r2][c2]
 
             if z == x:
-                L[r2][c2] = y
+                set_cell(r2, c2, y)
             else:
                 # z and y have positive coefficients
                 # x is the improper term with a negative coefficient
@@ -137,8 +136,9 @@ def generateSquare(L_start):
             # y and z are proper while x is the
             # improper symbol in the cell L[r2, c2].
 
-            r1 = row_containing_sym(L, c2, x)
-            c1 = column_containing_sym(L, r2, x)
+            moves += 1
+            r1 = row_containing_sym(L_cer, c2, x)
+            c1 = column_containing_sym(L_erc, r2, x)
 
             # choose one of the proper symbols
             # uniformly at random (we will use whatever
@@ -147,12 +147,12 @@ def generateSquare(L_start):
                 y, z = z, y
 
             # Add/subtract the symbolic difference (y - x)
-            L[r2][c2] = z
-            L[r1][c2] = y
-            L[r2][c1] = y
+            set_cell(r2, c2, z)
+            set_cell(r1, c2, y)
+            set_cell(r2, c1, y)
 
             if L[r1][c1] == y:
-                L[r1][c1] = x
+                set_cell(r1, c1, x)
                 proper = True
             else:  # got another improper square
                 z = L[r1][c1]
@@ -164,7 +164,75 @@ def generateSquare(L_start):
                 # usual
                 proper = False  # for emphasis
 
+def generateBatches(L_start, batch_size, burn_in=0, thin=1):
+    """
+    Generator for batches of batch_size independent copies of the squares
+    produced by generateSquare, each batch packed row by row into one
+    array('B') of batch_size * n * n symbols. Use unpack_batch to walk the
+    squares of a batch without copying them again.
+    """
+    n = len(L_start)
+    generator = generateSquare(L_start, burn_in, thin)
+    while True:
+        batch = array('B')
+        for _ in range(batch_size):
+            for row in next(generator):
+                batch.extend(row)
+        yield batch
+
+def unpack_batch(batch, n):
+    """
+    Yields the squares of a batch from generateBatches as lists of row
+    views, which the transversal counters accept directly.
+    """
+    view = memoryview(batch)
+    for start in range(0, len(batch), n * n):
+        yield [view[start + r * n:start + (r + 1) * n] for r in range(n)]
+
+def random_state():
+    """Returns the state of the random module in a JSON-serialisable form."""
+    version, internal, gauss_next = random.getstate()
+    return [version, list(internal), gauss_next]
+
+def resume_chain(state, thin=1):
+    """
+    Restarts a chain from a checkpoint taken at a square it yielded, given
+    as a dict with the square and its random_state() at that point.
+
+    Squares are only yielded in the proper state, so the square and the
+    random state are the whole state of the chain there (the improper-state
+    variables are reset on the next move). The random state is restored and
+    the returned generator yields exactly the squares the original run would
+    have yielded next, without repeating the checkpointed one.
+    """
+    _restore_random(state)
+    # The checkpointed square counts as the first of the thin squares skipped.
+    return generateSquare(state["square"], burn_in=thin, thin=thin)
+
+def resume_batches(state, batch_size, thin=1):
+    """
+    Restarts a chain like resume_chain, yielding its next squares in
+    batches of batch_size as generateBatches does.
+    """
+    _restore_random(state)
+    return generateBatches(state["square"], batch_size, burn_in=thin, thin=thin)
+
+def _restore_random(state):
+    version, internal, gauss_next = state["random"]
+    random.setstate((version, tuple(internal), gauss_next))
+
 def main():
+    parser = argparse.ArgumentParser(description="Search for a Latin square without a complete transversal.")
+    parser.add_argument("--checkpoint", default=None, help="file to save the chain state to periodically")
+    parser.add_argument("--checkpoint-every", type=int, default=10000, help="squares checked between checkpoints")
+    parser.add_argument("--resume", action="store_true", help="continue from the checkpoint file")
+    parser.add_argument("--metrics", default=None, help="file to export search metrics to every 1000 squares")
+    parser.add_argument("--metrics-format", choices=["prometheus", "json"], default="prometheus",
+                        help="Prometheus text file (replaced) or JSON lines (appended)")
+    args = parser.parse_args()
+    if args.metrics is not None:
+        metrics.enable()
+
     seed = [[0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10],
             [1, 0, 3, 2, 5, 4, 7, 6, 9, 10, 8],
             [2, 3, 0, 1, 6, 7, 4, 5, 10, 8, 9],
@@ -179,20 +247,45 @@ def main():
     
     print(f"Searching for a Latin square of order {n} without a complete transversal...")
     
-    count = 0
-    generator = generateSquare(seed)
+    state = None
+    if args.resume:
+        if args.checkpoint is None:
+            parser.error("--resume needs --checkpoint")
+        state = load_checkpoint(args.checkpoint)
+    if state is None:
+        count = 0
+        generator = generateSquare(seed)
+    else:
+        count = state["count"]
+        generator = resume_chain(state)
+        print(f"Resuming after {count} Latin squares...")
+    # Repairs the previous square's transversal before searching (pure-Python engine only).
+    witness = TransversalWitness()
     while True:
         count += 1
-        seed = next(generator)
+        if metrics.enabled:
+            started = time.perf_counter()
+            seed = next(generator)
+            generated = time.perf_counter()
+            found = witness.check(seed)
+            metrics.record_square(generated - started, time.perf_counter() - generated)
+        else:
+            seed = next(generator)
+            found = witness.check(seed)
         if count % 1000 == 0:
             print(f"Checked {count} Latin squares...")
+            if args.metrics is not None:
+                metrics.export(args.metrics, args.metrics_format, count=count)
 
-        if not has_transversal(seed):
+        if not found:
             print("Found a Latin square without a complete transversal:")
             for row in seed:
                 print(row)
             break
 
+        if args.checkpoint is not None and count % args.checkpoint_every == 0:
+            save_checkpoint(args.checkpoint, {"count": count, "square": seed, "random": random_state()})
+
     print("No Latin square without a complete transversal was found in the searched space.")
 
 
@@ -0,0 +1,210 @@
+"""
+Guided search for Latin squares with few transversals.
+
+Instead of sampling squares uniformly, the Jacobson-Matthews moves of
+generateSquare are used as proposals of a Metropolis chain whose target
+weights a square by exp(-transversals / temperature). The move set is
+symmetric (the chain is reversible with a uniform limit), so a proposed
+square with count c' replacing one with count c is accepted with
+probability min(1, exp(-(c' - c) / temperature)).
+
+The acceptance test is drawn before the proposal is counted: with u
+uniform in (0, 1], the proposal is accepted exactly when
+
+    c' <= c - temperature * ln(u),
+
+so it is counted with that bound as its limit and rejected as soon as the
+count passes it, without being counted in full.
+
+Two modes are available:
+    anneal  one chain whose temperature falls geometrically from
+            --t-start to --t-end (simulated annealing);
+    temper  --replicas chains at fixed temperatures between --t-min and
+            --t-max, run side by side in worker processes, with
+            neighbouring replicas offered a swap of their squares after
+            every --sweep steps (parallel tempering).
+Both are reproducible from --seed.
+"""
+import argparse
+import math
+import multiprocessing
+import random
+import time
+
+from isotopy import IsotopyCache
+from markov import generateSquare
+from markovCount import n, seed_square
+from transversalEngine import fastest_counter
+
+# Per-process cache and counter, so worker processes keep theirs between rounds.
+_cache = None
+_counter = None
+
+
+def _tools():
+    global _cache, _counter
+    if _cache is None:
+        _cache = IsotopyCache()
+        _counter = fastest_counter()
+    return _cache, _counter
+
+
+def metropolis_step(square, count, temperature, moves=1):
+    """
+    Proposes the square moves proper Jacobson-Matthews steps away from
+    square and accepts it with the Metropolis rule at temperature (0 only
+    accepts squares with no more transversals). Uses the random module.
+    Returns (square, count, accepted): the proposal and its exact count if
+    it was accepted, otherwise the given square and count.
+    """
+    cache, counter = _tools()
+    proposal = [row[:] for row in next(generateSquare(square, burn_in=moves))]
+    bound = count
+    if temperature > 0:
+        bound += math.floor(-temperature * math.log(1.0 - random.random()))
+    new_count = cache.count(proposal, counter, bound)
+    if new_count is None:
+        return square, count, False
+    return proposal, new_count, True
+
+
+def temperature_at(step, steps, t_start, t_end):
+    """Geometric cooling schedule: t_start at step 0, t_end at the last step."""
+    if steps <= 1:
+        return t_end
+    return t_start * (t_end / t_start) ** (step / (steps - 1))
+
+
+def anneal(square, steps, t_start, t_end, seed, moves=1, report_every=100):
+    """
+    Runs simulated annealing from square for steps proposals and returns
+    (lowest count, square achieving it, counted proposals).
+    """
+    random.seed(seed)
+    cache, counter = _tools()
+    count = counter(square)
+    best = (count, [row[:] for row in square])
+    accepted = 0
+    for step in range(steps):
+        temperature = temperature_at(step, steps, t_start, t_end)
+        square, count, moved = metropolis_step(square, count, temperature, moves)
+        accepted += moved
+        if count < best[0]:
+            best = (count, [row[:] for row in square])
+            print(f"Step {step + 1}: new minimum {count} transversals (temperature {temperature:.2f})")
+        if (step + 1) % report_every == 0:
+            print(f"Step {step + 1}: current {count}, best {best[0]}, temperature {temperature:.2f}, "
+                  f"accepted {accepted / (step + 1):.1%}")
+    return best[0], best[1], steps
+
+
+def temperature_ladder(replicas, t_min, t_max):
+    """Temperatures spaced geometrically from t_min to t_max."""
+    if replicas == 1:
+        return [t_min]
+    return [t_min * (t_max / t_min) ** (i / (replicas - 1)) for i in range(replicas)]
+
+
+def run_replica(task):
+    """
+    Runs sweep Metropolis steps of one replica, given as (square, count,
+    temperature, sweep, moves, seed). Returns (square, count, best count,
+    best square, accepted steps).
+    """
+    square, count, temperature, sweep, moves, seed = task
+    random.seed(seed)
+    best = (count, square)
+    accepted = 0
+    for _ in range(sweep):
+        square, count, moved = metropolis_step(square, count, temperature, moves)
+        accepted += moved
+        if count < best[0]:
+            best = (count, square)
+    return square, count, best[0], best[1], accepted
+
+
+def parallel_tempering(square, temperatures, rounds, sweep, seed, workers=1, moves=1):
+    """
+    Runs one replica per temperature, all starting from square, for rounds
+    rounds of sweep steps each. After every round neighbouring replicas i
+    and i + 1 (alternately the even and odd pairs) swap squares with
+    probability min(1, exp((c_i - c_j) * (1 / t_i - 1 / t_j))).
+
+    Replicas run in a pool of workers processes (in this process when
+    workers is 1). Each replica draws from its own seed per round, derived
+    from seed, so the result does not depend on workers. Returns (lowest
+    count, square achieving it, counted proposals).
+    """
+    rng = random.Random(seed)
+    _, counter = _tools()
+    count = counter(square)
+    states = [([row[:] for row in square], count) for _ in temperatures]
+    best = (count, [row[:] for row in square])
+    swaps = [0] * (len(temperatures) - 1)
+    pool = multiprocessing.Pool(workers) if workers > 1 else None
+    try:
+        for round_index in range(rounds):
+            tasks = [(state, energy, temperature, sweep, moves, rng.getrandbits(64))
+                     for (state, energy), temperature in zip(states, temperatures)]
+            results = pool.map(run_replica, tasks) if pool is not None else list(map(run_replica, tasks))
+            states = [(state, energy) for state, energy, _, _, _ in results]
+            for _, _, best_count, best_square, _ in results:
+                if best_count < best[0]:
+                    best = (best_count, best_square)
+                    print(f"Round {round_index + 1}: new minimum {best_count} transversals")
+
+            for i in range(round_index % 2, len(temperatures) - 1, 2):
+                (_, c_i), (_, c_j) = states[i], states[i + 1]
+                exponent = (c_i - c_j) * (1 / temperatures[i] - 1 / temperatures[i + 1])
+                if exponent >= 0 or rng.random() < math.exp(exponent):
+                    states[i], states[i + 1] = states[i + 1], states[i]
+                    swaps[i] += 1
+
+            counts = " ".join(str(energy) for _, energy in states)
+            print(f"Round {round_index + 1}: counts by temperature {counts}, best {best[0]}")
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    print("Swaps accepted between neighbouring temperatures: " + " ".join(str(s) for s in swaps))
+    return best[0], best[1], rounds * sweep * len(temperatures)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Guided search for Latin squares with few transversals.")
+    parser.add_argument("--seed", type=int, default=0, help="random seed of the run")
+    parser.add_argument("--moves", type=int, default=1, help="proper Jacobson-Matthews steps per proposal")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    anneal_parser = commands.add_parser("anneal", help="simulated annealing with one chain")
+    anneal_parser.add_argument("--steps", type=int, default=10000, help="proposals made")
+    anneal_parser.add_argument("--t-start", type=float, default=50.0, help="initial temperature")
+    anneal_parser.add_argument("--t-end", type=float, default=2.0, help="final temperature")
+
+    temper_parser = commands.add_parser("temper", help="parallel tempering with several replicas")
+    temper_parser.add_argument("--replicas", type=int, default=multiprocessing.cpu_count(), help="number of replicas")
+    temper_parser.add_argument("--t-min", type=float, default=2.0, help="lowest temperature")
+    temper_parser.add_argument("--t-max", type=float, default=50.0, help="highest temperature")
+    temper_parser.add_argument("--rounds", type=int, default=1000, help="rounds of steps followed by swaps")
+    temper_parser.add_argument("--sweep", type=int, default=10, help="steps of each replica between swaps")
+    temper_parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count(), help="worker processes")
+    args = parser.parse_args()
+
+    print(f"Searching for Latin squares of order {n} with few transversals ({args.command}, seed {args.seed})...")
+    start = time.time()
+    if args.command == "anneal":
+        num_trans, latin, proposals = anneal(seed_square, args.steps, args.t_start, args.t_end, args.seed, args.moves)
+    else:
+        temperatures = temperature_ladder(args.replicas, args.t_min, args.t_max)
+        print("Temperatures: " + " ".join(f"{t:.2f}" for t in temperatures))
+        num_trans, latin, proposals = parallel_tempering(seed_square, temperatures, args.rounds, args.sweep,
+                                                         args.seed, args.workers, args.moves)
+    print(f"Made {proposals} proposals in {time.time() - start:.1f}s")
+    print(f"Minimum number of transversals found: {num_trans}")
+    print("Latin square achieving this:")
+    for row in latin:
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,201 +1,139 @@
+import argparse
 import random
+import time
 
-n=11 # Order of the square to be checked
-
-def count_transversals(square, limit):
-    n = len(square)
-    used_cols = [False] * n
-    count = 0
-
-    def backtrack(row, used_symbols):
-        nonlocal count
-        # Early exit if we've exceeded the limit.
-        if count > limit:
-            count+=9999 # Set count to a large value so it doesn't flag as a new minuimum 
-            return
-
-        if row == n:
-            count += 1
-            return
-
-        for col in range(n):
-            if not used_cols[col]:
-                symbol = square[row][col]
-                if symbol in used_symbols:
-                    continue
-                used_cols[col] = True
-                used_symbols.add(symbol)
-                backtrack(row + 1, used_symbols)
-                used_cols[col] = False
-                used_symbols.remove(symbol)
-
-    backtrack(0, set())
-    return count
-
-def row_containing_sym(L, c, x):
-    r1 = -1
-    r2 = -1
-
-    for r in range(len(L)):
-        if r1 >= 0 and r2 >= 0:
-            break
-
-        if L[r][c] == x and r1 < 0:
-            r1 = r
-            continue
-
-        if L[r][c] == x and r2 < 0:
-            r2 = r
-            break
-
-    assert r1 >= 0 and r2 >= 0
-
-    return r1 if (random.random() < 0.5) else r2
-
-def column_containing_sym(L, r, x):
-    c1 = -1
-    c2 = -1
-
-    for c in range(len(L)):
-        if c1 >= 0 and c2 >= 0:
-            break
-
-        if L[r][c] == x and c1 < 0:
-            c1 = c
-            continue
-
-        if L[r][c] == x and c2 < 0:
-            c2 = c
-            break
-
-    assert c1 >= 0 and c2 >= 0
-
-    return c1 if (random.random() < 0.5) else c2
-
-def generateSquare(L_start):
-    """Generator for a sequence of uniformly distributed latin squares,
-    given L_start as the initial latin square.
-
-    This code implements the Markov chain algorithm of Jacobson and Matthews (1996), 
-    based on the sagemath implementation in Python.
-
-    REFERENCES:
-
-    Mark T. Jacobson and Peter Matthews, "Generating uniformly
-    distributed random Latin squares", Journal of Combinatorial Designs, 4 (1996).  
-    https://doi.org/10.1002/(SICI)1520-6610(1996)4:6%3C405::AID-JCD3%3E3.0.CO;2-J
-    The SageMath Developers. (2025). SageMath (Version 10.7.beta0) [Computer software].
-    https://doi.org/10.5281/zenodo.8042260"""
-    
-    r1 = r2 = c1 = c2 = x = y = z = -1
-    proper = True
-
-    from copy import copy
-    L = copy(L_start)
+import metrics
+from checkpoint import load_checkpoint, save_checkpoint
+from markov import generateBatches, generateSquare, random_state, resume_batches, resume_chain, unpack_batch
+from transversalEngine import fastest_counter
+from transversalEstimate import estimate_transversals
+from transversalIncremental import IncrementalCounter
 
-    L_cer = [[None] * n for _ in range(n)]
-    L_erc = [[None] * n for _ in range(n)]
-
-    while True:
-        if proper:
-            # Update the other two conjugates
-            for r in range(n):
-                for c in range(n):
-                    e = L[r][c]
-
-                    L_cer[c][e] = r
-                    L_erc[e][r] = c
-
-            yield L
-
-            r1 = random.randint(0, n-1)
-            c1 = random.randint(0, n-1)
-            x = L[r1][c1]
-
-            y = x
-            while y == x:
-                y = random.randint(0, n-1)
-
-
-            c2 = L_erc[y][r1]
-            r2 = L_cer[c1][y]
-
-            L[r1][c1] = y
-            L[r1][c2] = x
-            L[r2][c1] = x
-
-            # Now deal with the unknown point.
-            # We want to form z + (y - x)
-            z = L[r2][c2]
-
-            if z == x:
-                L[r2][c2] = y
-            else:
-                # z and y have positive coefficients
-                # x is the improper term with a negative coefficient
-                proper = False
-        else:  # improper square,
-            # L[r2, c2] = y + z - x
-            # y and z are proper while x is the
-            # improper symbol in the cell L[r2, c2].
-
-            r1 = row_containing_sym(L, c2, x)
-            c1 = column_containing_sym(L, r2, x)
-
-            # choose one of the proper symbols
-            # uniformly at random (we will use whatever
-            # lands in variable y).
-            if (random.random() < 0.5):
-                y, z = z, y
-
-            # Add/subtract the symbolic difference (y - x)
-            L[r2][c2] = z
-            L[r1][c2] = y
-            L[r2][c1] = y
-
-            if L[r1][c1] == y:
-                L[r1][c1] = x
-                proper = True
-            else:  # got another improper square
-                z = L[r1][c1]
-                x, y = y, x
-                r2 = r1
-                c2 = c1
-
-                # Now we have L[r2, c2] = z+y-x as
-                # usual
-                proper = False  # for emphasis
+n=11 # Order of the square to be checked
+burn_in=0 # proper squares of the chain discarded before the first one is checked
+thin=10 # only every thin-th proper square is checked, consecutive ones are nearly identical
+screen_samples=0 # Monte-Carlo samples screening each square before its exact count, 0 counts every square
+screen_z=3 # a screened square is skipped if its estimate is more than screen_z standard errors above the minimum
+batch_size=0 # squares counted together with NumPy (transversalBatch.py), 0 counts them one at a time
+incremental=False # update the count from the previous square's (transversalIncremental.py), pays off with thin=1
+
+seed_square = [[0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10],
+               [1, 0, 3, 2, 5, 4, 7, 6, 9, 10, 8],
+               [2, 3, 0, 1, 6, 7, 4, 5, 10, 8, 9],
+               [3, 2, 1, 0, 7, 8, 9, 10, 4, 5, 6],
+               [4, 5, 6, 7, 0, 9, 10, 8, 1, 2, 3],
+               [5, 4, 7, 6, 1, 10, 8, 9, 0, 3, 2],
+               [6, 7, 8, 9, 10, 0, 1, 2, 3, 4, 5],
+               [8, 9, 10, 4, 2, 3, 5, 1, 6, 0, 7],
+               [10, 6, 5, 8, 9, 2, 3, 4, 7, 1, 0],
+               [9, 8, 4, 10, 3, 6, 2, 0, 5, 7, 1],
+               [7, 10, 9, 5, 8, 1, 0, 3, 2, 6, 4]] # starting square for the generator, has 3126 transversals
+
+def screened_out(latin, min_transversals, seed):
+    """
+    Checks whether a Monte-Carlo estimate puts the square clearly above the
+    current minimum, so its exact count can be skipped. The estimator gets
+    its own RNG seeded from seed, leaving the chain's random state alone.
+    """
+    estimate, error = estimate_transversals(latin, screen_samples, random.Random(seed))
+    return estimate - screen_z * error > min_transversals
+
+def batch_counts(batches):
+    """
+    Yields (square, transversal count) for the squares of batches, as made
+    by generateBatches, each batch counted at once with transversalBatch,
+    which needs NumPy. The squares are row views into their batch. The
+    chain has only reached the yielded square at the end of each batch.
+    """
+    from transversalBatch import batch_count_transversals
+    for batch in batches:
+        yield from zip(unpack_batch(batch, n), batch_count_transversals(batch, n=n).tolist())
 
 def main():
+    parser = argparse.ArgumentParser(description="Markov chain search for the minimum number of transversals.")
+    parser.add_argument("--checkpoint", default=None, help="file to save the chain state and best square to periodically")
+    parser.add_argument("--checkpoint-every", type=int, default=1000, help="squares checked between checkpoints")
+    parser.add_argument("--resume", action="store_true", help="continue from the checkpoint file")
+    parser.add_argument("--metrics", default=None, help="file to export search metrics to every 1000 squares")
+    parser.add_argument("--metrics-format", choices=["prometheus", "json"], default="prometheus",
+                        help="Prometheus text file (replaced) or JSON lines (appended)")
+    args = parser.parse_args()
+    if args.metrics is not None:
+        metrics.enable()
+
     min_transversals = 3126
-    seed = [[0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10],
-            [1, 0, 3, 2, 5, 4, 7, 6, 9, 10, 8],
-            [2, 3, 0, 1, 6, 7, 4, 5, 10, 8, 9],
-            [3, 2, 1, 0, 7, 8, 9, 10, 4, 5, 6],
-            [4, 5, 6, 7, 0, 9, 10, 8, 1, 2, 3],
-            [5, 4, 7, 6, 1, 10, 8, 9, 0, 3, 2],
-            [6, 7, 8, 9, 10, 0, 1, 2, 3, 4, 5],
-            [8, 9, 10, 4, 2, 3, 5, 1, 6, 0, 7],
-            [10, 6, 5, 8, 9, 2, 3, 4, 7, 1, 0],
-            [9, 8, 4, 10, 3, 6, 2, 0, 5, 7, 1],
-            [7, 10, 9, 5, 8, 1, 0, 3, 2, 6, 4]]
     min_square = None
+    counter = fastest_counter()
     print(f"Searching for the minimum number of transversals in Latin squares of order {n}...")
     
-    count = 0
-    generator = generateSquare(seed)
+    state = None
+    if args.resume:
+        if args.checkpoint is None:
+            parser.error("--resume needs --checkpoint")
+        state = load_checkpoint(args.checkpoint)
+    if state is None:
+        count = 0
+        if batch_size:
+            batches = generateBatches(seed_square, batch_size, burn_in, thin)
+        else:
+            generator = generateSquare(seed_square, burn_in, thin)
+    else:
+        if state["thin"] != thin:
+            parser.error(f"{args.checkpoint} was written with thin={state['thin']}")
+        count = state["count"]
+        min_transversals = state["min_transversals"]
+        min_square = state["min_square"]
+        if batch_size:
+            batches = resume_batches(state, batch_size, thin)
+        else:
+            generator = resume_chain(state, thin)
+        print(f"Resuming after {count} Latin squares, minimum so far {min_transversals}...")
+    if batch_size:
+        # The chain state only matches the checked square at the end of a batch.
+        if args.checkpoint_every % batch_size:
+            parser.error(f"--checkpoint-every must be a multiple of batch_size ({batch_size})")
+        counted = batch_counts(batches)
+    elif incremental:
+        tracker = IncrementalCounter(seed_square if state is None else state["square"], counter)
     while True:
         count += 1
-        latin = next(generator)
+        if metrics.enabled:
+            started = time.perf_counter()
+        if batch_size:
+            latin, num_trans = next(counted)
+            if num_trans > min_transversals:
+                num_trans = None
+        else:
+            latin = next(generator)
+            if metrics.enabled:
+                generated = time.perf_counter()
+            if incremental:
+                # Every square is counted exactly, so the tracker can follow the chain.
+                num_trans = tracker.update(latin)
+                if num_trans > min_transversals:
+                    num_trans = None
+            elif screen_samples and screened_out(latin, min_transversals, count):
+                num_trans = None
+            else:
+                # Counting stops as soon as the square has more transversals than the minimum (None).
+                # Chain squares almost never repeat an isotopy class, so they are not cached.
+                num_trans = counter(latin, limit=min_transversals)
+        if metrics.enabled:
+            finished = time.perf_counter()
+            if batch_size:
+                # Generation and counting are interleaved inside batch_counts.
+                metrics.record_square(0.0, finished - started)
+            else:
+                metrics.record_square(generated - started, finished - generated)
         if count % 1000 == 0:
             print(f"Checked {count} Latin squares...")
-
-        num_trans = count_transversals(latin, min_transversals)
+            if args.metrics is not None:
+                metrics.export(args.metrics, args.metrics_format, count=count, min_transversals=min_transversals)
         
         # Update minimum if needed.
-        if num_trans <= min_transversals:
+        if num_trans is not None:
             min_transversals = num_trans
-            min_square = latin
+            min_square = [list(row) for row in latin]
             print(f"New minimum found: {min_transversals} transversals")
             print("Latin square achieving this:")
             for row in min_square:
@@ -203,10 +141,15 @@ def main():
             # Stop if a Latin square with no transversal is found.
             if min_transversals == 0:
                 print("Found a Latin square with 0 transversals:")
-                for row in latin:
+                for row in min_square:
                     print(row)
                 break
 
+        if args.checkpoint is not None and count % args.checkpoint_every == 0:
+            save_checkpoint(args.checkpoint, {"count": count, "thin": thin, "square": [list(row) for row in latin],
+                                              "random": random_state(),
+                                              "min_transversals": min_transversals, "min_square": min_square})
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,121 @@
+import argparse
+import multiprocessing
+import random
+import time
+
+from markov import generateSquare
+from markovCount import burn_in, n, seed_square, thin
+from transversalEngine import fastest_counter
+
+
+def worker_seeds(master_seed, workers):
+    """
+    Derives one independent RNG seed per worker from the master seed, so a
+    run is reproducible from the master seed and the number of workers.
+    """
+    rng = random.Random(master_seed)
+    return [rng.getrandbits(64) for _ in range(workers)]
+
+
+def search_worker(index, seed, squares, shared_min, results, report_every):
+    """
+    Runs one Jacobson-Matthews chain in a worker process.
+
+    Squares are counted with the current global minimum as a bound, so
+    those above it are rejected early. Every square whose transversal count
+    is at most the global minimum is sent back to the parent and lowers the
+    shared minimum, so the bound every other worker tests against tightens
+    immediately. The worker's own best square (lowest count, earliest step)
+    is always sent back at the end, which keeps the final result
+    independent of timing: the shared minimum never drops below the final
+    answer, so the squares achieving it are always counted exactly.
+    """
+    random.seed(seed)
+    generator = generateSquare(seed_square, burn_in, thin)
+    counter = fastest_counter()
+    best = (float('inf'), 0, None)
+    step = 0
+    while squares is None or step < squares:
+        latin = next(generator)
+        step += 1
+
+        # Squares above the global minimum are rejected without a full count (None).
+        num_trans = counter(latin, limit=shared_min.value)
+        if num_trans is not None and num_trans < best[0]:
+            best = (num_trans, step, [row[:] for row in latin])
+
+        if num_trans is not None and num_trans <= shared_min.value:
+            with shared_min.get_lock():
+                if num_trans <= shared_min.value:
+                    shared_min.value = num_trans
+                    results.put(("minimum", index, step, num_trans, [row[:] for row in latin]))
+
+        if step % report_every == 0:
+            results.put(("progress", index, step, None, None))
+
+    results.put(("done", index, step, best[0], best[2]))
+
+
+def parallel_search(workers, master_seed, squares=None, min_transversals=3126, report_every=100):
+    """
+    Runs independent Markov chains in worker processes and returns the
+    lowest transversal count found together with the square achieving it.
+
+    squares is the number of squares each worker checks (None runs until
+    interrupted). Ties are broken by worker index and step, so a finite run
+    gives the same answer for the same master seed and number of workers.
+    """
+    shared_min = multiprocessing.Value('i', min_transversals)
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=search_worker,
+                                         args=(index, seed, squares, shared_min, results, report_every),
+                                         daemon=True)
+                 for index, seed in enumerate(worker_seeds(master_seed, workers))]
+
+    print(f"Searching for the minimum number of transversals in Latin squares of order {n} "
+          f"with {workers} workers (master seed {master_seed})...")
+    start = time.time()
+    for process in processes:
+        process.start()
+
+    checked = [0] * workers
+    finals = []
+    while len(finals) < workers:
+        kind, index, step, num_trans, latin = results.get()
+        checked[index] = step
+        if kind == "minimum":
+            print(f"Worker {index} found a new minimum at step {step}: {num_trans} transversals")
+            for row in latin:
+                print(row)
+        elif kind == "done":
+            finals.append((num_trans, index, latin))
+        else:
+            total = sum(checked)
+            print(f"Checked {total} Latin squares ({total / (time.time() - start):.1f} squares/s)...")
+
+    for process in processes:
+        process.join()
+
+    total = sum(checked)
+    print(f"Checked {total} Latin squares in {time.time() - start:.1f}s "
+          f"({total / (time.time() - start):.1f} squares/s)")
+    num_trans, index, latin = min(finals, key=lambda final: final[:2])
+    return num_trans, latin
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel Jacobson-Matthews search for the minimum number of transversals.")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count(), help="number of worker processes")
+    parser.add_argument("--seed", type=int, default=0, help="master seed for the worker RNG streams")
+    parser.add_argument("--squares", type=int, default=None, help="squares checked per worker (default: run until interrupted)")
+    args = parser.parse_args()
+
+    num_trans, latin = parallel_search(args.workers, args.seed, args.squares)
+    print(f"Minimum number of transversals found: {num_trans}")
+    print("Latin square achieving this:")
+    for row in latin:
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Optional instrumentation shared by the searches.
+
+Metrics are off by default. The searches check the enabled flag once per
+call (not per node), so leaving them off costs close to nothing; when on,
+the transversal searches run an instrumented copy of their loop that also
+counts nodes. Counters are kept per name and label set, Prometheus style:
+
+    search_nodes_total{search="count_transversals",depth="3"}
+
+and can be exported as a Prometheus text file (write_prometheus) or
+appended as one JSON object per line to a structured log (log_json).
+
+Recorded by the scripts:
+    search_calls_total, search_nodes_total, search_pruned_total
+        transversal searches: calls, nodes expanded per depth, branches cut
+        per depth because the symbol was used (reason="symbol") and
+        searches stopped early by a limit (reason="limit")
+    dp_states_total, dp_pruned_total
+        count_transversals_dp: table states per depth, top states skipped
+        once the limit was passed
+    chain_moves_total, chain_proper_squares_total
+        generateSquare: moves made and proper squares reached
+    squares_checked_total, generation_seconds_total, counting_seconds_total
+        driver loops: squares checked and the time spent producing and
+        counting them
+    decomposition_nodes_total, decomposition_dead_ends_total
+        the exact-cover decomposition search, per depth
+"""
+import json
+import os
+import time
+
+enabled = False
+PREFIX = "latin_"
+
+_counters = {}
+_started = None
+
+
+def enable():
+    """Turns metrics on and starts the clock used for rates."""
+    global enabled, _started
+    enabled = True
+    if _started is None:
+        _started = time.perf_counter()
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def reset():
+    """Clears every counter and restarts the clock."""
+    global _started
+    _counters.clear()
+    _started = time.perf_counter() if enabled else None
+
+
+def add(name, value=1, **labels):
+    """Adds value to the counter name with the given labels."""
+    key = (name, tuple(sorted((label, str(v)) for label, v in labels.items())))
+    _counters[key] = _counters.get(key, 0) + value
+
+
+def add_depths(name, values, **labels):
+    """Adds values[d] to the counter name labelled depth=d, skipping zeros."""
+    for depth, value in enumerate(values):
+        if value:
+            add(name, value, depth=depth, **labels)
+
+
+def record_square(generation_seconds, counting_seconds):
+    """Records one square checked by a driver loop and where its time went."""
+    add("squares_checked_total")
+    add("generation_seconds_total", generation_seconds)
+    add("counting_seconds_total", counting_seconds)
+
+
+def total(name):
+    """Returns the sum of a counter over all its label sets."""
+    return sum(value for (key, _), value in _counters.items() if key == name)
+
+
+def snapshot():
+    """
+    Returns the counters as a dict: name -> list of (labels dict, value),
+    plus the derived uptime_seconds and squares_per_second gauges.
+    """
+    metrics = {}
+    for (name, labels), value in sorted(_counters.items()):
+        metrics.setdefault(name, []).append((dict(labels), value))
+    if _started is not None:
+        uptime = time.perf_counter() - _started
+        metrics["uptime_seconds"] = [({}, uptime)]
+        squares = total("squares_checked_total")
+        if squares and uptime > 0:
+            metrics["squares_per_second"] = [({}, squares / uptime)]
+    return metrics
+
+
+def prometheus_text():
+    """Returns the metrics in the Prometheus text exposition format."""
+    lines = []
+    for name, samples in snapshot().items():
+        kind = "counter" if name.endswith("_total") else "gauge"
+        lines.append(f"# TYPE {PREFIX}{name} {kind}")
+        for labels, value in samples:
+            label_text = ",".join(f'{label}="{v}"' for label, v in labels.items())
+            lines.append(f"{PREFIX}{name}{{{label_text}}} {value}" if label_text else f"{PREFIX}{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(filename):
+    """
+    Writes the metrics to filename for a Prometheus node exporter textfile
+    collector, replacing the file atomically.
+    """
+    tmp = f"{filename}.tmp"
+    with open(tmp, "w") as f:
+        f.write(prometheus_text())
+    os.replace(tmp, filename)
+
+
+def log_json(filename, **fields):
+    """
+    Appends one JSON line with a timestamp, the given fields and every
+    metric (as name -> list of [labels, value]) to filename.
+    """
+    record = {"time": time.time(), **fields,
+              "metrics": {name: [[labels, value] for labels, value in samples]
+                          for name, samples in snapshot().items()}}
+    with open(filename, "a") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+def export(filename, output_format="prometheus", **fields):
+    """Writes the metrics to filename as "prometheus" text or a "json" log line."""
+    if output_format == "json":
+        log_json(filename, **fields)
+    else:
+        write_prometheus(filename)
@@ -0,0 +1,167 @@
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import time
+
+from backtracking import free_cells, generate_latin_squares, latin_square_prefixes
+from checkpoint import load_checkpoint, save_checkpoint
+from isotopy import IsotopyCache
+from transversalEngine import fastest_counter
+
+
+def shard_prefixes(n, depth):
+    """
+    Returns the shards of the exhaustive search over reduced squares of
+    order n: the possible values of the first depth free cells (the start
+    of the second row, then the third), in enumeration order. Shard i is
+    always the same prefix for the same n and depth.
+    """
+    return list(latin_square_prefixes(n, depth, reduced=True))
+
+
+def shard_filename(directory, index):
+    return os.path.join(directory, f"shard-{index:06d}.json")
+
+
+def run_shard(n, depth, index, prefix, directory, checkpoint_every=1000):
+    """
+    Searches one shard and leaves its result in the shard file.
+
+    The file is rewritten atomically every checkpoint_every squares with the
+    number of squares checked and the best square so far. A restarted shard
+    regenerates the squares already checked without counting them and goes
+    on from there. A finished shard is not searched again, so running a
+    shard twice is harmless.
+    """
+    filename = shard_filename(directory, index)
+    state = load_checkpoint(filename)
+    if state is not None and (state["n"] != n or state["prefix"] != list(prefix)):
+        raise ValueError(f"{filename} belongs to a different search")
+    if state is None:
+        state = {"n": n, "depth": depth, "shard": index, "prefix": list(prefix),
+                 "checked": 0, "min": None, "square": None, "done": False}
+    if state["done"]:
+        return state
+
+    cache = IsotopyCache(maxsize=20000)
+    counter = fastest_counter()
+    skip = state["checked"]
+    checked = 0
+    for latin in generate_latin_squares(n, reduced=True, prefix=prefix):
+        checked += 1
+        if checked <= skip:
+            continue
+        # Squares with more transversals than the shard's minimum are rejected early (None).
+        num_trans = cache.count(latin, counter, state["min"])
+        if num_trans is not None and (state["min"] is None or num_trans < state["min"]):
+            state["min"] = num_trans
+            state["square"] = latin.tolist()
+        if checked % checkpoint_every == 0:
+            state["checked"] = checked
+            save_checkpoint(filename, state)
+
+    state["checked"] = checked
+    state["done"] = True
+    save_checkpoint(filename, state)
+    return state
+
+
+def _run_shard(args):
+    n, depth, index, prefix, directory, checkpoint_every = args
+    start = time.time()
+    state = run_shard(n, depth, index, prefix, directory, checkpoint_every)
+    print(f"Shard {index}: {state['checked']} squares, minimum {state['min']} "
+          f"({time.time() - start:.1f}s)", flush=True)
+    return state
+
+
+def run_shards(n, depth, indices, directory, workers=1, checkpoint_every=1000):
+    os.makedirs(directory, exist_ok=True)
+    prefixes = shard_prefixes(n, depth)
+    jobs = [(n, depth, index, prefixes[index], directory, checkpoint_every) for index in indices]
+    if workers == 1:
+        return [_run_shard(job) for job in jobs]
+    with multiprocessing.Pool(workers) as pool:
+        return list(pool.imap_unordered(_run_shard, jobs))
+
+
+def merge(directory, n, depth):
+    """
+    Collects the shard files and returns (minimum, square, shards done,
+    total shards, squares checked). Ties go to the lowest shard index.
+    """
+    total = len(shard_prefixes(n, depth))
+    best = None
+    done = 0
+    checked = 0
+    for filename in sorted(glob.glob(os.path.join(directory, "shard-*.json"))):
+        with open(filename, "r") as f:
+            state = json.load(f)
+        if state["n"] != n or state["depth"] != depth:
+            continue
+        checked += state["checked"]
+        done += state["done"]
+        if state["min"] is not None and (best is None or state["min"] < best[0]):
+            best = (state["min"], state["square"])
+    if best is None:
+        return None, None, done, total, checked
+    return best[0], best[1], done, total, checked
+
+
+def parse_indices(spec, total):
+    """Parses shard lists such as "3", "0-99" or "0-9,20,30-39"."""
+    indices = []
+    for part in spec.split(","):
+        if "-" in part:
+            first, last = part.split("-")
+            indices.extend(range(int(first), int(last) + 1))
+        else:
+            indices.append(int(part))
+    for index in indices:
+        if not 0 <= index < total:
+            raise ValueError(f"shard {index} out of range (0-{total - 1})")
+    return indices
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exhaustive minimum-transversal search over reduced Latin squares, split into shards.")
+    parser.add_argument("command", choices=["list", "run", "merge"])
+    parser.add_argument("--order", type=int, default=10, help="order of the Latin squares")
+    parser.add_argument("--depth", type=int, default=4, help="free cells fixed per shard (second row first)")
+    parser.add_argument("--dir", default="shards", help="directory holding the shard result files")
+    parser.add_argument("--shards", default=None, help="shards to run, e.g. 0-99 (default: all)")
+    parser.add_argument("--machine", type=int, default=0, help="index of this machine, runs shards with index %% machines == machine")
+    parser.add_argument("--machines", type=int, default=1, help="number of machines sharing the search")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count(), help="worker processes on this machine")
+    parser.add_argument("--checkpoint-every", type=int, default=1000, help="squares between shard checkpoints")
+    args = parser.parse_args()
+
+    n = args.order
+    cells = len(free_cells(n, reduced=True))
+    if not 0 <= args.depth <= cells:
+        parser.error(f"--depth must be between 0 and {cells} for order {n}")
+    if args.command == "list":
+        for index, prefix in enumerate(shard_prefixes(n, args.depth)):
+            print(index, list(prefix))
+    elif args.command == "run":
+        total = len(shard_prefixes(n, args.depth))
+        indices = parse_indices(args.shards, total) if args.shards else range(total)
+        indices = [index for index in indices if index % args.machines == args.machine]
+        print(f"Running {len(indices)} of {total} shards of order {n} with {args.workers} workers...")
+        run_shards(n, args.depth, indices, args.dir, args.workers, args.checkpoint_every)
+    else:
+        minimum, square, done, total, checked = merge(args.dir, n, args.depth)
+        print(f"{done}/{total} shards finished, {checked} Latin squares checked.")
+        if minimum is None:
+            print("No results yet.")
+            return
+        print(f"Minimum number of transversals found: {minimum}")
+        print("Latin square achieving this:")
+        for row in square:
+            print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Transversal counts for many Latin squares at once, using NumPy.
+
+This is the meet-in-the-middle count of count_transversals_dp run on a
+whole batch of squares together. Every partial transversal state of every
+square is one int64 key,
+
+    (square index << 2n) | (used symbols << n) | used columns,
+
+with its number of partial transversals alongside. A row is added to all
+the states of all the squares with a few array operations, and states
+reaching the same key are merged by sorting, so the interpreter overhead
+is paid once per row and batch rather than once per state. The top and
+bottom tables stop one row short of each other and the middle row is
+matched against the sorted bottom keys with searchsorted.
+
+Squares are given as a (B, n, n) uint8 array, for example a batch from
+markov.generateBatches passed through as_batch. NumPy is only needed by
+this module; the rest of the scripts run without it.
+"""
+import numpy as np
+
+# Squares processed together. The largest table holds a few times 10^4
+# states per order-11 square, so this keeps a chunk to some tens of MB.
+DEFAULT_CHUNK = 64
+
+
+def as_batch(squares, n=None):
+    """
+    Returns squares as a (B, n, n) uint8 array. squares may be such an
+    array, a sequence of squares (lists of rows or LatinSquare objects), or
+    a flat buffer of B * n * n symbols (as produced by
+    markov.generateBatches), in which case n is required.
+    """
+    if isinstance(squares, np.ndarray) and squares.ndim == 3:
+        return squares.astype(np.uint8, copy=False)
+    if n is not None:
+        return np.frombuffer(squares, dtype=np.uint8).reshape(-1, n, n)
+    if squares and hasattr(squares[0], "cells"):
+        # LatinSquare objects: join their buffers instead of walking rows.
+        order = len(squares[0])
+        cells = b"".join(square.cells for square in squares)
+        return np.frombuffer(cells, dtype=np.uint8).reshape(len(squares), order, order)
+    return np.array(squares, dtype=np.uint8).reshape(len(squares), -1, len(squares[0]))
+
+
+def _extend(keys, counts, rows, n):
+    """
+    Adds one row to every state. rows is the (B, n) array of that row's
+    symbols in each square. Returns the merged (keys, counts), keys sorted.
+    """
+    full = (1 << n) - 1
+    col_bits = np.left_shift(np.int64(1), np.arange(n, dtype=np.int64))
+    index = keys >> (2 * n)
+    sym_bits = np.left_shift(np.int64(1), rows[index].astype(np.int64))
+    used_cols = (keys & full)[:, None]
+    used_syms = ((keys >> n) & full)[:, None]
+    valid = ((used_cols & col_bits) == 0) & ((used_syms & sym_bits) == 0)
+    extended = (keys[:, None] | col_bits | (sym_bits << n))[valid]
+    weights = np.broadcast_to(counts[:, None], valid.shape)[valid]
+    return _merge(extended, weights)
+
+
+def _merge(keys, counts):
+    """Sums the counts of equal keys. Returns (sorted unique keys, counts)."""
+    if len(keys) == 0:
+        return keys, counts
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+    counts = counts[order]
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    return keys[starts], np.add.reduceat(counts, starts)
+
+
+def _count_chunk(squares):
+    size, n, _ = squares.shape
+    full = (1 << n) - 1
+    full_key = full | (full << n)
+    initial = np.arange(size, dtype=np.int64) << (2 * n)
+    ones = np.ones(size, dtype=np.int64)
+
+    split = n // 2
+    top_keys, top_counts = initial, ones
+    for row in range(split):
+        top_keys, top_counts = _extend(top_keys, top_counts, squares[:, row], n)
+
+    bottom_keys, bottom_counts = initial, ones
+    for row in range(n - 1, split, -1):
+        bottom_keys, bottom_counts = _extend(bottom_keys, bottom_counts, squares[:, row], n)
+
+    totals = np.zeros(size, dtype=np.int64)
+    # Add the middle row without merging, then look up the complement of
+    # each state in the bottom table of the same square.
+    col_bits = np.left_shift(np.int64(1), np.arange(n, dtype=np.int64))
+    index = top_keys >> (2 * n)
+    sym_bits = np.left_shift(np.int64(1), squares[:, split][index].astype(np.int64))
+    used_cols = (top_keys & full)[:, None]
+    used_syms = ((top_keys >> n) & full)[:, None]
+    valid = ((used_cols & col_bits) == 0) & ((used_syms & sym_bits) == 0)
+    middle = (top_keys[:, None] | col_bits | (sym_bits << n))[valid]
+    weights = np.broadcast_to(top_counts[:, None], valid.shape)[valid]
+    if len(middle) == 0 or len(bottom_keys) == 0:
+        return totals
+    targets = (middle & ~np.int64(full_key)) | (full_key ^ (middle & full_key))
+    positions = np.searchsorted(bottom_keys, targets)
+    positions = np.minimum(positions, len(bottom_keys) - 1)
+    found = bottom_keys[positions] == targets
+    np.add.at(totals, middle[found] >> (2 * n), weights[found] * bottom_counts[positions[found]])
+    return totals
+
+
+def batch_count_transversals(squares, n=None, chunk=DEFAULT_CHUNK):
+    """
+    Counts the transversals of every square of a batch (see as_batch for
+    the accepted forms). Returns an int64 array of B counts, equal to
+    count_transversals_dp on each square. Squares are processed chunk at a
+    time to bound memory. Orders up to 15 fit the 64-bit state keys.
+    """
+    squares = as_batch(squares, n)
+    size, order, _ = squares.shape
+    if order == 0:
+        return np.ones(size, dtype=np.int64)
+    if 2 * order + max(min(size, chunk) - 1, 1).bit_length() > 63:
+        raise ValueError(f"order {order} is too large for chunks of {chunk} squares")
+    totals = np.empty(size, dtype=np.int64)
+    for start in range(0, size, chunk):
+        totals[start:start + chunk] = _count_chunk(squares[start:start + chunk])
+    return totals
+
+
+def batch_has_transversal(squares, n=None, chunk=DEFAULT_CHUNK):
+    """
+    Checks every square of a batch for a complete transversal. Returns a
+    bool array of B results. This costs as much as batch_count_transversals.
+    """
+    return batch_count_transversals(squares, n, chunk) > 0
@@ -1,13 +1,30 @@
 import ast
 import sys
 
+import metrics
+from transversalStore import is_binary, load_binary
+
 # Global counter for tracking iterations in the backtracking search.
 iterations = 0
 n = 11
 
 def load_transversals(filename):
+    """
+    Loads transversals as sets of (row, col) cells, from either the binary
+    format of transversalStore.py or the text format written by
+    findTransversals.py.
+    """
     transversals = []
     try:
+        if is_binary(filename):
+            with load_binary(filename) as store:
+                if store.n != n:
+                    print(f"Error: {filename} holds transversals of order {store.n}, expected {n}.")
+                    sys.exit(1)
+                transversals = [set(enumerate(columns)) for columns in store]
+            print(f"Loaded {len(transversals)} transversals.")
+            return transversals
+
         with open(filename, "r") as f:
             for line in f:
                 line = line.strip()
@@ -31,37 +48,112 @@ def load_transversals(filename):
     print(f"Loaded {len(transversals)} transversals.")
     return transversals
 
-def search_decomposition(transversals, selected, used_cells, start_index):
-    global iterations
-    iterations += 1
-    if iterations % 100000 == 0:
-        print(f"Progress: iterations={iterations}, current selected count={len(selected)}, selected {selected}")
-        
-    # check if transversals cover the entire square.
-    if len(selected) == n:
-        if len(used_cells) == n * n:
-            return selected
-        return None
+def build_cover(transversals):
+    """
+    Sets up the exact-cover problem: every cell of the square must be
+    covered by exactly one chosen transversal. Cells are numbered
+    row * n + col and sets of transversals are integer bitsets over their
+    indices. Returns (cells, conflicts, masks), where cells[k] is the set of
+    transversals covering cell k, conflicts[i] the set of transversals
+    sharing a cell with transversal i (itself included) and masks[i] the
+    bitset of the cells of transversal i.
+    """
+    cells = [0] * (n * n)
+    masks = []
+    for index, transversal in enumerate(transversals):
+        bit = 1 << index
+        mask = 0
+        for r, c in transversal:
+            cells[r * n + c] |= bit
+            mask |= 1 << (r * n + c)
+        masks.append(mask)
+    conflicts = []
+    for mask in masks:
+        conflict = 0
+        while mask:
+            cell = mask & -mask
+            mask ^= cell
+            conflict |= cells[cell.bit_length() - 1]
+        conflicts.append(conflict)
+    return cells, conflicts, masks
 
-    # Try candidates from the current start_index.
-    for i in range(start_index, len(transversals)):
-        candidate = transversals[i]
-        if candidate & used_cells:
-            continue
-        selected.append(candidate)
-        new_used = used_cells | candidate
-        result = search_decomposition(transversals, selected, new_used, i + 1)
-        if result is not None:
-            return result
-        selected.pop()
-    
+def iter_decompositions(transversals):
+    """
+    Yields every decomposition of the square into n disjoint transversals,
+    as a list of indices into transversals.
+
+    This is Knuth's Algorithm X on a bitset exact-cover matrix: the
+    transversals still compatible with the ones chosen form one integer
+    bitset, choosing a transversal clears its conflicts from it, and each
+    level branches on the uncovered cell that the fewest compatible
+    transversals cover, so dead ends are found as early as possible.
+
+    While metrics are enabled, the nodes visited and the dead ends (an
+    uncovered cell no remaining transversal covers) are recorded per depth
+    when the generator finishes or is closed.
+    """
+    cells, conflicts, masks = build_cover(transversals)
+    size = n * n
+    selected = []
+    nodes = [0] * (size + 1) if metrics.enabled else None
+    dead_ends = [0] * (size + 1) if metrics.enabled else None
+
+    def search(alive, covered):
+        global iterations
+        iterations += 1
+        if iterations % 100000 == 0:
+            print(f"Progress: iterations={iterations}, current selected count={len(selected)}, selected {selected}")
+
+        if covered == (1 << size) - 1:
+            yield list(selected)
+            return
+        best = None
+        fewest = len(transversals) + 1
+        for cell in range(size):
+            if covered >> cell & 1:
+                continue
+            options = cells[cell] & alive
+            count = options.bit_count()
+            if count < fewest:
+                best, fewest = options, count
+                if count <= 1:
+                    break
+        if nodes is not None:
+            nodes[len(selected)] += 1
+            if not fewest:
+                dead_ends[len(selected)] += 1
+        while best:
+            bit = best & -best
+            best ^= bit
+            index = bit.bit_length() - 1
+            selected.append(index)
+            yield from search(alive & ~conflicts[index], covered | masks[index])
+            selected.pop()
+
+    try:
+        yield from search((1 << len(transversals)) - 1, 0)
+    finally:
+        if nodes is not None:
+            metrics.add_depths("decomposition_nodes_total", nodes)
+            metrics.add_depths("decomposition_dead_ends_total", dead_ends)
+
+def search_decomposition(transversals):
+    """
+    Returns the first decomposition found, as a list of transversals
+    (sets of (row, col) cells), or None if there is none.
+    """
+    for indices in iter_decompositions(transversals):
+        return [transversals[i] for i in indices]
     return None
 
+def count_decompositions(transversals):
+    return sum(1 for _ in iter_decompositions(transversals))
+
 def main():
     global iterations
     transversals = load_transversals("transversals.txt")
     print(f"Starting search for a decomposition into {n} disjoint transversals...")
-    solution = search_decomposition(transversals, selected=[], used_cells=set(), start_index=0)
+    solution = search_decomposition(transversals)
     print(f"Total iterations: {iterations}")
     if solution is not None:
         print("A valid decomposition into distinct transversals was found!")
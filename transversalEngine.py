@@ -0,0 +1,629 @@
+"""
+Shared bitmask engine for finding and counting transversals of Latin squares.
+
+Free columns and free symbols are kept as integer bitmasks. Each row of the
+square is precomputed into a table mapping a column bit to the bit of the
+symbol in that cell, and the search only walks the still-free columns whose
+symbol is also still free, using lowest-set-bit iteration.
+
+has_transversal and count_transversals run the compiled search of
+transversalKernel instead when Numba is installed, and an instrumented
+copy of the Python search while metrics are enabled.
+"""
+import metrics
+import transversalKernel
+
+
+def symbol_table(square):
+    """
+    Returns, for each row, a dict mapping the bit of a column (1 << col)
+    to the bit of the symbol in that cell (1 << square[row][col]).
+    """
+    return [{1 << col: 1 << symbol for col, symbol in enumerate(row)} for row in square]
+
+
+def column_table(square):
+    """
+    Returns, for each row, a dict mapping the bit of a symbol to the bit of
+    the column holding that symbol in the row (the inverse of symbol_table).
+    """
+    return [{1 << symbol: 1 << col for col, symbol in enumerate(row)} for row in square]
+
+
+def _columns_for_symbols(columns, cache, free_symbols):
+    """
+    Returns the mask of columns of one row whose symbol is in free_symbols.
+    At row r exactly n - r symbols are free, so each row only ever sees a
+    small number of distinct masks and the answer is cached per row.
+    """
+    mask = 0
+    symbols = free_symbols
+    while symbols:
+        symbol = symbols & -symbols
+        symbols ^= symbol
+        mask |= columns[symbol]
+    cache[free_symbols] = mask
+    return mask
+
+
+def _has_matching(masks):
+    """
+    Checks whether each mask in masks can be given a distinct one of its
+    bits, i.e. whether the bipartite graph with these neighbour sets has a
+    matching covering the masks (Kuhn's augmenting paths).
+    """
+    owner = {}
+    seen = 0
+
+    def augment(i):
+        nonlocal seen
+        candidates = masks[i]
+        while candidates:
+            bit = candidates & -candidates
+            candidates ^= bit
+            if seen & bit:
+                continue
+            seen |= bit
+            j = owner.get(bit)
+            if j is None or augment(j):
+                owner[bit] = i
+                return True
+        return False
+
+    for i in range(len(masks)):
+        seen = 0
+        if not augment(i):
+            return False
+    return True
+
+
+def _completable(table, columns, caches, row, free_cols, free_symbols):
+    """
+    Forward check for the search: returns False if rows row.. provably
+    cannot be completed with the free columns and symbols. Every remaining
+    row, free column and free symbol must still have a usable cell, and the
+    row-column, row-symbol and column-symbol graphs of the usable cells must
+    each have a perfect matching.
+    """
+    row_cols = []
+    row_symbols = []
+    col_symbols = {}
+    reachable = 0
+    for r in range(row, len(table)):
+        cache = caches[r]
+        usable = cache.get(free_symbols)
+        if usable is None:
+            usable = _columns_for_symbols(columns[r], cache, free_symbols)
+        usable &= free_cols
+        if not usable:
+            return False
+        bits = table[r]
+        symbols = 0
+        candidates = usable
+        while candidates:
+            col = candidates & -candidates
+            candidates ^= col
+            symbol = bits[col]
+            symbols |= symbol
+            col_symbols[col] = col_symbols.get(col, 0) | symbol
+        row_cols.append(usable)
+        row_symbols.append(symbols)
+        reachable |= symbols
+    if len(col_symbols) < len(row_cols) or reachable != free_symbols:
+        return False
+    return (_has_matching(row_cols) and _has_matching(row_symbols)
+            and _has_matching(list(col_symbols.values())))
+
+
+def has_transversal(square, prune=False):
+    """
+    Checks if the given Latin square has a complete transversal.
+    A transversal is a selection of n entries (one per row and column)
+    with all symbols distinct.
+
+    With prune=True the pure-Python search is used, and also runs
+    _completable at each node of the first n // 2 rows, cutting subtrees
+    whose remaining rows, columns and symbols can no longer be matched.
+    """
+    n = len(square)
+    if n == 0:
+        return True
+    if not prune:
+        if metrics.enabled:
+            count, _ = _instrumented_search(square, 0, "has_transversal")
+            return count > 0
+        kernel = transversalKernel.load()
+        if kernel is not None:
+            return kernel(transversalKernel.symbol_bits(square), n, 0) > 0
+    table = symbol_table(square)
+    columns = column_table(square)
+    caches = [{} for _ in range(n)]
+    last = n - 1
+    checked = n // 2 if prune else -1
+
+    def backtrack(row, free_cols, free_symbols):
+        cache = caches[row]
+        usable = cache.get(free_symbols)
+        if usable is None:
+            usable = _columns_for_symbols(columns[row], cache, free_symbols)
+        candidates = free_cols & usable
+        if row == last:
+            return candidates != 0
+        if row <= checked and not _completable(table, columns, caches, row, free_cols, free_symbols):
+            return False
+        bits = table[row]
+        while candidates:
+            col = candidates & -candidates
+            candidates ^= col
+            if backtrack(row + 1, free_cols ^ col, free_symbols ^ bits[col]):
+                return True
+        return False
+
+    full = (1 << n) - 1
+    return backtrack(0, full, full)
+
+
+def count_transversals(square, limit=None):
+    """
+    Counts the transversals of the given Latin square.
+
+    If limit is given, the search stops as soon as more than limit
+    transversals have been found and None is returned instead of a count,
+    so a square above the current minimum is rejected without being
+    counted in full.
+    """
+    n = len(square)
+    if n == 0:
+        return 1 if limit is None or limit >= 1 else None
+    if metrics.enabled:
+        count, stopped = _instrumented_search(square, float('inf') if limit is None else limit, "count_transversals")
+        if stopped:
+            metrics.add("search_pruned_total", search="count_transversals", reason="limit")
+            return None
+        return count
+    kernel = transversalKernel.load()
+    if kernel is not None:
+        bound = transversalKernel.NO_LIMIT if limit is None else limit
+        count = kernel(transversalKernel.symbol_bits(square), n, bound)
+        return None if count > bound else count
+    table = symbol_table(square)
+    columns = column_table(square)
+    caches = [{} for _ in range(n)]
+    last = n - 1
+    bound = float('inf') if limit is None else limit
+    count = 0
+
+    def backtrack(row, free_cols, free_symbols):
+        """Returns True once the count has passed the bound."""
+        nonlocal count
+        cache = caches[row]
+        usable = cache.get(free_symbols)
+        if usable is None:
+            usable = _columns_for_symbols(columns[row], cache, free_symbols)
+        candidates = free_cols & usable
+        if row == last:
+            if candidates:
+                count += 1
+                return count > bound
+            return False
+        bits = table[row]
+        while candidates:
+            col = candidates & -candidates
+            candidates ^= col
+            if backtrack(row + 1, free_cols ^ col, free_symbols ^ bits[col]):
+                return True
+        return False
+
+    full = (1 << n) - 1
+    if backtrack(0, full, full):
+        return None
+    return count
+
+
+def _count_allowed(square, allowed):
+    """
+    Counts the transversals of square that only use, in each row, the
+    columns in the bitmask allowed[row].
+    """
+    n = len(square)
+    kernel = transversalKernel.load()
+    if kernel is not None:
+        symbols = transversalKernel.symbol_bits(square)
+        for row, mask in enumerate(allowed):
+            for col in range(n):
+                if not mask >> col & 1:
+                    # A zero symbol bit never matches a free symbol.
+                    symbols[row, col] = 0
+        return kernel(symbols, n, transversalKernel.NO_LIMIT)
+    table = symbol_table(square)
+    columns = column_table(square)
+    caches = [{} for _ in range(n)]
+    last = n - 1
+    count = 0
+
+    def backtrack(row, free_cols, free_symbols):
+        nonlocal count
+        cache = caches[row]
+        usable = cache.get(free_symbols)
+        if usable is None:
+            usable = _columns_for_symbols(columns[row], cache, free_symbols)
+        candidates = free_cols & usable & allowed[row]
+        if row == last:
+            if candidates:
+                count += 1
+            return
+        bits = table[row]
+        while candidates:
+            col = candidates & -candidates
+            candidates ^= col
+            backtrack(row + 1, free_cols ^ col, free_symbols ^ bits[col])
+
+    full = (1 << n) - 1
+    backtrack(0, full, full)
+    return count
+
+
+def count_transversals_through(square, cells):
+    """
+    Counts the transversals of the given Latin square that use at least one
+    of the given (row, col) cells.
+
+    The cells are grouped by row. For each such row in turn, this counts
+    the transversals through one of its given cells that avoid the given
+    cells of the rows before it, searching that row first so only its
+    given columns are tried. Each search costs roughly the fraction of a
+    full count that the row's given cells make up of the row.
+    """
+    n = len(square)
+    full = (1 << n) - 1
+    rows = {}
+    for row, col in cells:
+        rows[row] = rows.get(row, 0) | 1 << col
+    allowed = [full] * n
+    total = 0
+    for row, mask in rows.items():
+        order = [row] + [r for r in range(n) if r != row]
+        allowed[row] = mask
+        total += _count_allowed([square[r] for r in order], [allowed[r] for r in order])
+        allowed[row] = full ^ mask
+    return total
+
+
+def _instrumented_search(square, bound, name):
+    """
+    The search of count_transversals, also recording in metrics the nodes
+    expanded at each depth (depth n counts complete transversals) and the
+    free columns skipped at each depth because their symbol was used.
+    Stops once the count passes bound. Returns (count, stopped early).
+    """
+    n = len(square)
+    table = symbol_table(square)
+    columns = column_table(square)
+    caches = [{} for _ in range(n)]
+    last = n - 1
+    nodes = [0] * (n + 1)
+    pruned = [0] * n
+    count = 0
+
+    def backtrack(row, free_cols, free_symbols):
+        nonlocal count
+        nodes[row] += 1
+        cache = caches[row]
+        usable = cache.get(free_symbols)
+        if usable is None:
+            usable = _columns_for_symbols(columns[row], cache, free_symbols)
+        candidates = free_cols & usable
+        pruned[row] += bin(free_cols).count("1") - bin(candidates).count("1")
+        if row == last:
+            if candidates:
+                count += 1
+                nodes[n] += 1
+                return count > bound
+            return False
+        bits = table[row]
+        while candidates:
+            col = candidates & -candidates
+            candidates ^= col
+            if backtrack(row + 1, free_cols ^ col, free_symbols ^ bits[col]):
+                return True
+        return False
+
+    full = (1 << n) - 1
+    stopped = backtrack(0, full, full)
+    metrics.add("search_calls_total", search=name)
+    metrics.add_depths("search_nodes_total", nodes, search=name)
+    metrics.add_depths("search_pruned_total", pruned, search=name, reason="symbol")
+    return count, stopped
+
+
+def count_transversals_mrv(square, limit=None):
+    """
+    Counts the transversals of the given Latin square with a search that,
+    instead of taking the rows in order, branches at each node on the
+    remaining row, column or symbol with the fewest usable cells (the
+    most-constrained-first rule of exact-cover search). A transversal
+    covers every row, column and symbol once, so each line type is an
+    equally valid choice, and choosing per node subsumes running the
+    row-by-row search on the best conjugate of the square.
+
+    Gives the same results as count_transversals, limit included. There is
+    no compiled version.
+    """
+    n = len(square)
+    table = symbol_table(square)
+    columns = column_table(square)
+    # col_rows[c]: symbol bit -> row bit in column c;
+    # symbol_rows[s]: column bit -> row bit of the cells holding symbol s.
+    col_rows = [{} for _ in range(n)]
+    symbol_rows = [{} for _ in range(n)]
+    for row, values in enumerate(square):
+        for col, symbol in enumerate(values):
+            col_rows[col][1 << symbol] = 1 << row
+            symbol_rows[symbol][1 << col] = 1 << row
+    row_caches = [{} for _ in range(n)]
+    col_caches = [{} for _ in range(n)]
+    symbol_caches = [{} for _ in range(n)]
+    bound = float('inf') if limit is None else limit
+    nodes = [0] * (n + 1)
+    count = 0
+
+    def options(lines, tables, caches, free, other, best, fewest):
+        """
+        Finds the line of lines (a mask) with the fewest usable cells,
+        given as the mask of free entries reached through tables[line] from
+        the free mask other. Returns (line, cells, fewest) or the given best.
+        """
+        while lines:
+            bit = lines & -lines
+            lines ^= bit
+            line = bit.bit_length() - 1
+            cache = caches[line]
+            usable = cache.get(other)
+            if usable is None:
+                usable = _columns_for_symbols(tables[line], cache, other)
+            usable &= free
+            size = bin(usable).count("1")
+            if size < fewest:
+                best = (line, usable)
+                fewest = size
+                if size <= 1:
+                    break
+        return best, fewest
+
+    def backtrack(depth, free_rows, free_cols, free_symbols):
+        """Returns True once the count has passed the bound."""
+        nonlocal count
+        nodes[depth] += 1
+        if not free_rows:
+            count += 1
+            return count > bound
+        row_best, fewest = options(free_rows, columns, row_caches, free_cols, free_symbols, None, n + 1)
+        best = kind = None
+        if row_best is not None:
+            best, kind = row_best, "row"
+        if fewest > 1:
+            col_best, col_fewest = options(free_cols, col_rows, col_caches, free_rows, free_symbols, None, fewest)
+            if col_best is not None:
+                best, kind, fewest = col_best, "col", col_fewest
+        if fewest > 1:
+            symbol_best, symbol_fewest = options(free_symbols, symbol_rows, symbol_caches, free_rows, free_cols,
+                                                 None, fewest)
+            if symbol_best is not None:
+                best, kind, fewest = symbol_best, "symbol", symbol_fewest
+        if fewest == 0:
+            return False
+        line, cells = best
+        while cells:
+            cell = cells & -cells
+            cells ^= cell
+            if kind == "row":
+                row, col = 1 << line, cell
+            elif kind == "col":
+                row, col = cell, 1 << line
+            else:
+                row, col = cell, columns[cell.bit_length() - 1][1 << line]
+            symbol = table[row.bit_length() - 1][col]
+            if backtrack(depth + 1, free_rows ^ row, free_cols ^ col, free_symbols ^ symbol):
+                return True
+        return False
+
+    full = (1 << n) - 1
+    stopped = backtrack(0, full, full, full)
+    if metrics.enabled:
+        metrics.add("search_calls_total", search="count_transversals_mrv")
+        metrics.add_depths("search_nodes_total", nodes, search="count_transversals_mrv")
+    return None if stopped else count
+
+
+def has_transversal_mrv(square):
+    """Checks for a complete transversal with the search of count_transversals_mrv."""
+    # With limit 0 the search stops (None) at the first transversal.
+    return count_transversals_mrv(square, 0) is None
+
+
+def fastest_counter():
+    """
+    Returns the fastest exact counter available for the orders searched
+    here: count_transversals when it runs compiled (Numba installed and
+    metrics off), otherwise count_transversals_dp. Both take a limit keyword.
+    """
+    if not metrics.enabled and transversalKernel.load() is not None:
+        return count_transversals
+    return count_transversals_dp
+
+
+def iter_transversal_columns(square, prefix=(), depth=None):
+    """
+    Yields the transversals of the given Latin square as column
+    permutations (a list whose entry r is the column used in row r), in the
+    same order as a row-by-row search over columns 0..n-1.
+
+    Only transversals whose first rows use the columns in prefix are
+    produced. If depth is given, the search stops after that many rows and
+    yields the partial transversals instead. The same list is yielded each
+    time and modified in place afterwards, so copy it to keep it.
+    """
+    n = len(square)
+    stop = n if depth is None else depth
+    table = symbol_table(square)
+    columns = column_table(square)
+    caches = [{} for _ in range(n)]
+    chosen = [0] * stop
+
+    free_cols = (1 << n) - 1
+    free_symbols = (1 << n) - 1
+    for row, col in enumerate(prefix):
+        symbol = 1 << square[row][col]
+        if not (free_cols >> col) & 1 or not symbol & free_symbols:
+            return
+        free_cols ^= 1 << col
+        free_symbols ^= symbol
+        chosen[row] = col
+
+    def backtrack(row, free_cols, free_symbols):
+        if row == stop:
+            yield chosen
+            return
+        cache = caches[row]
+        usable = cache.get(free_symbols)
+        if usable is None:
+            usable = _columns_for_symbols(columns[row], cache, free_symbols)
+        candidates = free_cols & usable
+        bits = table[row]
+        while candidates:
+            col = candidates & -candidates
+            candidates ^= col
+            chosen[row] = col.bit_length() - 1
+            yield from backtrack(row + 1, free_cols ^ col, free_symbols ^ bits[col])
+
+    yield from backtrack(len(prefix), free_cols, free_symbols)
+
+
+def enumerate_transversals(square):
+    """
+    Yields every transversal of the given Latin square as a list of
+    (row, col, symbol), in the same order as a row-by-row search over
+    columns 0..n-1.
+    """
+    for chosen in iter_transversal_columns(square):
+        yield [(r, c, square[r][c]) for r, c in enumerate(chosen)]
+
+
+# Largest number of (used columns, used symbols) states kept in a single
+# dynamic-programming table. Each state costs roughly 100 bytes.
+DEFAULT_MAX_STATES = 1000000
+
+
+def _extend_layer(layer, bits, columns, n, max_states):
+    """
+    Extends a table of partial transversals by one row.
+
+    layer maps key = used_cols | (used_symbols << n) to the number of
+    partial transversals using exactly those columns and symbols. Returns
+    the table for one more row, or None if it would hold more than
+    max_states states.
+    """
+    full = (1 << n) - 1
+    cache = {}
+    extended = {}
+    get = extended.get
+    for key, count in layer.items():
+        free_symbols = full ^ (key >> n)
+        usable = cache.get(free_symbols)
+        if usable is None:
+            usable = _columns_for_symbols(columns, cache, free_symbols)
+        candidates = usable & ~key
+        while candidates:
+            col = candidates & -candidates
+            candidates ^= col
+            new_key = key | col | (bits[col] << n)
+            extended[new_key] = get(new_key, 0) + count
+        if len(extended) > max_states:
+            return None
+    return extended
+
+
+def count_transversals_dp(square, max_states=DEFAULT_MAX_STATES, limit=None):
+    """
+    Counts the transversals of the given Latin square exactly, using
+    memoization over (rows processed, used columns, used symbols).
+
+    The top rows and the bottom rows are each folded into a table mapping
+    the used column/symbol masks to the number of partial transversals, and
+    a top state only matches the bottom state using the complementary
+    columns and symbols. Partial transversals that reach the same state are
+    therefore never explored twice. The two tables stop one row short of
+    each other and the middle row is tried directly from each top state
+    while looking up the bottom table, which is cheaper than building the
+    largest table. If either table would grow past max_states, it stops
+    short and the rows in between are walked by plain backtracking from
+    each top state, so the memory used stays bounded for larger orders.
+
+    If limit is given, the join stops as soon as the transversals counted
+    so far pass it and None is returned instead of a count.
+    """
+    n = len(square)
+    table = symbol_table(square)
+    columns = column_table(square)
+    full = (1 << n) - 1
+    full_key = full | (full << n)
+
+    top = {0: 1}
+    split = 0
+    while split < n // 2:
+        layer = _extend_layer(top, table[split], columns[split], n, max_states)
+        if layer is None:
+            break
+        top = layer
+        split += 1
+        if metrics.enabled:
+            metrics.add("dp_states_total", len(top), table="top", depth=split)
+
+    bottom = {0: 1}
+    start = n
+    while start > split + 1:
+        layer = _extend_layer(bottom, table[start - 1], columns[start - 1], n, max_states)
+        if layer is None:
+            break
+        bottom = layer
+        start -= 1
+        if metrics.enabled:
+            metrics.add("dp_states_total", len(bottom), table="bottom", depth=start)
+
+    lookup = bottom.get
+    caches = [{} for _ in range(n)]
+    last = start - 1
+
+    def backtrack(row, key):
+        if row == start:
+            return lookup(full_key ^ key, 0)
+        cache = caches[row]
+        free_symbols = full ^ (key >> n)
+        usable = cache.get(free_symbols)
+        if usable is None:
+            usable = _columns_for_symbols(columns[row], cache, free_symbols)
+        candidates = usable & ~key
+        bits = table[row]
+        total = 0
+        if row == last:
+            # The last row before the bottom table is matched directly.
+            while candidates:
+                col = candidates & -candidates
+                candidates ^= col
+                total += lookup(full_key ^ (key | col | (bits[col] << n)), 0)
+            return total
+        while candidates:
+            col = candidates & -candidates
+            candidates ^= col
+            total += backtrack(row + 1, key | col | (bits[col] << n))
+        return total
+
+    bound = float('inf') if limit is None else limit
+    total = 0
+    for done, (key, count) in enumerate(top.items(), 1):
+        total += count * backtrack(split, key)
+        if total > bound:
+            if metrics.enabled:
+                metrics.add("dp_pruned_total", len(top) - done)
+            return None
+    return total
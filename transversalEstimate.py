@@ -0,0 +1,102 @@
+"""
+Monte-Carlo estimates of the number of transversals of a Latin square.
+
+Knuth's estimator walks one random path down the row-by-row backtracking
+tree: at each row it picks one of the d columns still usable uniformly at
+random and multiplies the weight by d. A path that gets stuck scores 0 and
+a path that completes scores the product of its branching factors, whose
+expected value is exactly the number of transversals. The last exact_rows
+rows are counted exactly instead of sampled, with the counts of their
+(free columns, free symbols) states memoized across samples, which lowers
+the variance at little cost.
+
+Each estimator takes its own random.Random, so screening squares never
+disturbs the global random state driving the Markov chain.
+"""
+import math
+import random
+
+from transversalEngine import symbol_table
+
+DEFAULT_EXACT_ROWS = 4
+
+
+def knuth_samples(square, samples, rng=None, exact_rows=DEFAULT_EXACT_ROWS):
+    """
+    Yields samples independent unbiased estimates of the number of
+    transversals of the square. rng is a random.Random (a fresh one is
+    used if None).
+    """
+    if rng is None:
+        rng = random.Random()
+    n = len(square)
+    table = symbol_table(square)
+    full = (1 << n) - 1
+    tail = max(n - exact_rows, 0)
+    memo = {}
+
+    def exact(row, free_cols, free_symbols):
+        if row == n:
+            return 1
+        key = free_cols | (free_symbols << n)
+        total = memo.get(key)
+        if total is not None:
+            return total
+        bits = table[row]
+        total = 0
+        cols = free_cols
+        while cols:
+            col = cols & -cols
+            cols ^= col
+            if bits[col] & free_symbols:
+                total += exact(row + 1, free_cols ^ col, free_symbols ^ bits[col])
+        memo[key] = total
+        return total
+
+    for _ in range(samples):
+        free_cols = free_symbols = full
+        weight = 1
+        for row in range(tail):
+            bits = table[row]
+            candidates = []
+            cols = free_cols
+            while cols:
+                col = cols & -cols
+                cols ^= col
+                if bits[col] & free_symbols:
+                    candidates.append(col)
+            if not candidates:
+                weight = 0
+                break
+            weight *= len(candidates)
+            col = candidates[rng.randrange(len(candidates))]
+            free_cols ^= col
+            free_symbols ^= bits[col]
+        if weight:
+            weight *= exact(tail, free_cols, free_symbols)
+        yield weight
+
+
+def estimate_transversals(square, samples=1000, rng=None, exact_rows=DEFAULT_EXACT_ROWS):
+    """
+    Returns (estimate, standard error) of the number of transversals of the
+    square from samples Knuth estimates. The estimate is unbiased; the
+    estimates are heavy-tailed, so the standard error is itself noisy for
+    small sample sizes.
+    """
+    values = list(knuth_samples(square, samples, rng, exact_rows))
+    mean = sum(values) / samples
+    if samples < 2:
+        return mean, float('inf')
+    variance = sum((value - mean) ** 2 for value in values) / (samples - 1)
+    return mean, math.sqrt(variance / samples)
+
+
+def transversal_interval(square, samples=1000, z=1.96, rng=None, exact_rows=DEFAULT_EXACT_ROWS):
+    """
+    Returns a normal-approximation confidence interval (low, high) for the
+    number of transversals, z standard errors either side of the estimate
+    (z=1.96 for about 95%). low is never below 0.
+    """
+    estimate, error = estimate_transversals(square, samples, rng, exact_rows)
+    return max(estimate - z * error, 0), estimate + z * error
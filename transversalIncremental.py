@@ -0,0 +1,216 @@
+"""
+Transversal counts and transversals kept up to date along a Markov chain.
+
+Consecutive squares of generateSquare differ in a few cells. A transversal
+avoiding all the changed cells is a transversal of both squares, so
+
+    count(new) = count(old) - through(old) + through(new),
+
+where through counts the transversals using at least one changed cell
+(count_transversals_through). Each of those searches only tries the
+changed cells in one row, so a change of a few cells costs a fraction of
+a full count. The fraction grows with the number of changed cells, and
+beyond max_cells the square is simply counted again.
+
+By default changes of at most DEFAULT_MAX_CELLS cells are updated in
+place when the compiled kernel is available, and every change is
+recounted without it.
+
+TransversalWitness answers has_transversal along such a sequence by
+keeping a transversal of the last square and repairing it: rows whose
+symbols now clash are searched again together with a few random others,
+the rest of the transversal staying fixed. Squares with no repairable
+transversal go to the exact search.
+"""
+import argparse
+import random
+
+import transversalKernel
+from transversalEngine import count_transversals_through, fastest_counter, has_transversal, iter_transversal_columns
+
+# Changed cells up to which updating beats recounting with the kernel.
+DEFAULT_MAX_CELLS = 4
+
+
+class IncrementalCounter:
+    """
+    Follows a sequence of squares of the same order, each usually a few
+    cells away from the one before, and keeps the exact transversal count
+    of the latest one.
+    """
+
+    def __init__(self, square, counter=None, max_cells=None):
+        """
+        square is the first square of the sequence. counter is the exact
+        counter used to recount (fastest_counter() by default) and
+        max_cells the largest change updated in place (DEFAULT_MAX_CELLS
+        when the compiled kernel is available, otherwise 0).
+        """
+        if counter is None:
+            counter = fastest_counter()
+        if max_cells is None:
+            max_cells = DEFAULT_MAX_CELLS if transversalKernel.load() is not None else 0
+        self.counter = counter
+        self.max_cells = max_cells
+        self.square = [list(row) for row in square]
+        self.count = counter(self.square)
+        self.updates = 0
+        self.recounts = 0
+
+    def update(self, square):
+        """Moves on to square and returns its number of transversals."""
+        old = self.square
+        n = len(old)
+        changed = [(r, c) for r in range(n) for c in range(n) if old[r][c] != square[r][c]]
+        new = [list(row) for row in square]
+        if changed:
+            if len(changed) <= self.max_cells:
+                self.count += count_transversals_through(new, changed) - count_transversals_through(old, changed)
+                self.updates += 1
+            else:
+                self.count = self.counter(new)
+                self.recounts += 1
+        self.square = new
+        return self.count
+
+
+# Random rows released on top of the clashing ones, one repair attempt each.
+DEFAULT_REPAIR_ROWS = (1, 3, 5)
+
+
+def repair_transversal(square, columns, rng, extra_rows=DEFAULT_REPAIR_ROWS):
+    """
+    Tries to turn columns, the column used in each row by a transversal of
+    a nearby square, into a transversal of square. The rows holding a
+    repeated symbol are released and searched again, keeping the cells of
+    the other rows; each attempt also releases extra_rows[i] other rows
+    chosen with rng. Returns True and updates columns in place on success,
+    otherwise returns False and leaves columns unchanged. columns that are
+    not a permutation are never repaired.
+    """
+    n = len(square)
+    if len(set(columns)) != n:
+        return False
+    holders = {}
+    for row, col in enumerate(columns):
+        holders.setdefault(square[row][col], []).append(row)
+    clashing = {row for rows in holders.values() if len(rows) > 1 for row in rows}
+    if not clashing:
+        return True
+
+    def complete(chosen, index, rows, free_cols, free_symbols):
+        if index == len(rows):
+            return True
+        row = rows[index]
+        values = square[row]
+        cols = free_cols
+        while cols:
+            col = cols & -cols
+            cols ^= col
+            c = col.bit_length() - 1
+            symbol = 1 << values[c]
+            if symbol & free_symbols:
+                chosen[row] = c
+                if complete(chosen, index + 1, rows, free_cols ^ col, free_symbols ^ symbol):
+                    return True
+        return False
+
+    kept = [row for row in range(n) if row not in clashing]
+    for extra in extra_rows:
+        released = clashing.union(rng.sample(kept, min(extra, len(kept))))
+        free_cols = free_symbols = (1 << n) - 1
+        for row in range(n):
+            if row not in released:
+                free_cols ^= 1 << columns[row]
+                free_symbols ^= 1 << square[row][columns[row]]
+        # A failed attempt leaves cells in its released rows, so each starts afresh.
+        chosen = list(columns)
+        if complete(chosen, 0, sorted(released), free_cols, free_symbols):
+            columns[:] = chosen
+            return True
+    return False
+
+
+class TransversalWitness:
+    """
+    Checks a sequence of similar squares (consecutive squares of a Markov
+    chain or of the backtracking generator) for transversals, repairing the
+    transversal found for one square to get one for the next before falling
+    back to the exact search. The repair draws from its own random.Random,
+    so the chain's random state is left alone, and the answers are exact
+    whatever it draws. When the compiled kernel is available, check() just
+    calls has_transversal.
+    """
+
+    def __init__(self, seed=0, extra_rows=DEFAULT_REPAIR_ROWS):
+        self.rng = random.Random(seed)
+        self.extra_rows = extra_rows
+        self.columns = None
+        self.repaired = 0
+        self.searched = 0
+
+    def check(self, square):
+        """Returns True if square has a transversal."""
+        if transversalKernel.load() is not None:
+            return has_transversal(square)
+        if self.columns is not None and repair_transversal(square, self.columns, self.rng, self.extra_rows):
+            self.repaired += 1
+            return True
+        self.searched += 1
+        columns = next(iter_transversal_columns(square), None)
+        if columns is None:
+            # Keep the last transversal: it is still close to the next squares.
+            return False
+        self.columns = list(columns)
+        return True
+
+
+def _is_transversal(square, columns):
+    n = len(square)
+    return len(set(columns)) == n and len({square[row][col] for row, col in enumerate(columns)}) == n
+
+
+def check_witness(n, squares, seed=0, thin=1):
+    """
+    Runs TransversalWitness along squares squares of a Jacobson-Matthews
+    chain of order n, started from the cyclic square, with the compiled
+    kernel disabled so that the repair is used, and compares every answer
+    with has_transversal. A True answer must also leave the witness holding
+    a transversal of the square. Returns the indices of the squares where
+    either check fails.
+    """
+    # markov imports this module, so its generator is only imported here.
+    from markov import generateSquare
+
+    enabled = transversalKernel.enabled
+    transversalKernel.enabled = False
+    try:
+        random.seed(seed)
+        witness = TransversalWitness(seed)
+        generator = generateSquare([[(r + c) % n for c in range(n)] for r in range(n)], thin=thin)
+        wrong = []
+        for index in range(squares):
+            square = next(generator)
+            found = witness.check(square)
+            if found != has_transversal(square) or found and not _is_transversal(square, witness.columns):
+                wrong.append(index)
+        return wrong
+    finally:
+        transversalKernel.enabled = enabled
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Checks TransversalWitness against has_transversal along a chain.")
+    parser.add_argument("--order", type=int, default=6, help="order of the squares (even orders have squares without transversals)")
+    parser.add_argument("--squares", type=int, default=2000, help="squares of the chain checked")
+    parser.add_argument("--seed", type=int, default=0, help="random seed of the chain and the repair")
+    parser.add_argument("--thin", type=int, default=1, help="proper squares of the chain between checked ones")
+    args = parser.parse_args()
+    wrong = check_witness(args.order, args.squares, args.seed, args.thin)
+    print(f"{len(wrong)} of {args.squares} squares failed the check" + (f": {wrong[:20]}" if wrong else ""))
+    if wrong:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Optional compiled kernel for the transversal backtracker.
+
+search() is the row-by-row search of transversalEngine written as a single
+loop with an explicit stack over fixed-size integer arrays, so that Numba
+can compile it to machine code. When Numba is installed, has_transversal and
+count_transversals in transversalEngine run the compiled search; otherwise
+they keep their pure-Python search. Both give the same results.
+
+Numba (and NumPy) are only imported the first time the kernel is needed,
+so importing the engine stays fast whether or not they are installed. The
+compiled code is cached next to this file. Set enabled = False to force the
+pure-Python search.
+"""
+
+enabled = True
+
+# Stands in for "no limit"; far above any count that fits in the search.
+NO_LIMIT = (1 << 62) - 1
+
+_compiled = None
+_loaded = False
+
+
+def search(symbols, n, limit):
+    """
+    Counts the transversals of a square given as an (n, n) int64 array of
+    symbol bits (1 << symbol), stopping as soon as the count exceeds limit.
+    Returns the count reached, so limit=0 answers whether there is one.
+
+    cols[row:] always holds the columns still free at depth row: choosing
+    one swaps it into position row, and the swap is undone on the way back
+    up, so each row only looks at the free columns. The last two rows are
+    finished directly by trying both ways of using the two free columns.
+    """
+    full = (1 << n) - 1
+    cols = list(range(n))
+    free_symbols = [0] * (n + 1)
+    next_index = [0] * (n + 1)
+    free_symbols[0] = full
+    stop = n - 2 if n >= 3 else n
+    count = 0
+    row = 0
+    while row >= 0:
+        if row == stop:
+            if stop == n:
+                count += 1
+            else:
+                a = cols[row]
+                b = cols[row + 1]
+                remaining = free_symbols[row]
+                if symbols[row, a] | symbols[row + 1, b] == remaining:
+                    count += 1
+                if symbols[row, b] | symbols[row + 1, a] == remaining:
+                    count += 1
+            if count > limit:
+                return count
+            row -= 1
+            continue
+        index = next_index[row]
+        if index > row:
+            # Back from the column tried last: undo its swap.
+            col = cols[row]
+            cols[row] = cols[index - 1]
+            cols[index - 1] = col
+        remaining = free_symbols[row]
+        while index < n and not symbols[row, cols[index]] & remaining:
+            index += 1
+        if index == n:
+            row -= 1
+            continue
+        next_index[row] = index + 1
+        col = cols[row]
+        cols[row] = cols[index]
+        cols[index] = col
+        free_symbols[row + 1] = remaining ^ symbols[row, cols[row]]
+        row += 1
+        next_index[row] = row
+    return count
+
+
+def load():
+    """
+    Returns the compiled search, or None if Numba is not installed or the
+    kernel is disabled. Numba is imported on the first call.
+    """
+    global _compiled, _loaded
+    if not enabled:
+        return None
+    if not _loaded:
+        _loaded = True
+        try:
+            from numba import njit
+        except ImportError:
+            return None
+        _compiled = njit(cache=True)(search)
+    return _compiled
+
+
+def symbol_bits(square):
+    """Returns the (n, n) int64 array of 1 << square[row][col]."""
+    import numpy as np
+    n = len(square)
+    cells = getattr(square, "cells", None)
+    if cells is not None:
+        # A LatinSquare already holds its symbols in one flat buffer.
+        symbols = np.frombuffer(cells, dtype=np.uint8).astype(np.int64)
+    else:
+        symbols = np.array(square, dtype=np.int64)
+    return np.left_shift(np.int64(1), symbols.reshape(n, n))
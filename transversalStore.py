@@ -0,0 +1,303 @@
+"""
+Compact binary storage for the transversals of a Latin square.
+
+A transversal of an order n square picks one column in every row, so it is
+stored as its column permutation: n bytes, byte r holding the column used
+in row r (symbols follow from the square). The file starts with a fixed
+32-byte header:
+
+    magic      4 bytes   b"LTRV"
+    version    1 byte    1
+    order      1 byte    n
+    reserved   2 bytes
+    square     16 bytes  square_hash() of the source square
+    count      8 bytes   number of transversals, little-endian
+
+followed by count records of n bytes. Files are memory-mapped on load, so
+reading them needs no parsing. The older text format (one Python-repr list
+of (row, col, symbol) per line) can still be read and written.
+"""
+import ast
+import hashlib
+import mmap
+import struct
+
+MAGIC = b"LTRV"
+VERSION = 1
+HEADER = struct.Struct("<4sBB2x16sQ")
+
+
+def square_hash(square):
+    """
+    Returns a 16-byte digest identifying the square, stored in the header
+    so a file can be matched to the square it was computed from.
+    """
+    n = len(square)
+    data = bytes([n]) + bytes(symbol for row in square for symbol in row)
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def transversal_columns(transversal):
+    """
+    Converts a transversal given as (row, col, symbol) triples into its
+    column permutation.
+    """
+    columns = bytearray(len(transversal))
+    for row, col, _ in transversal:
+        columns[row] = col
+    return bytes(columns)
+
+
+def write_header(f, n, square_digest, count):
+    f.write(HEADER.pack(MAGIC, VERSION, n, square_digest, count))
+
+
+def write_binary(filename, transversals, square):
+    """
+    Writes transversals, given as (row, col, symbol) triples or as column
+    permutations, to filename in the binary format. Returns the count.
+    """
+    n = len(square)
+    count = 0
+    with open(filename, "wb") as f:
+        write_header(f, n, square_hash(square), 0)
+        for transversal in transversals:
+            if transversal and not isinstance(transversal[0], int):
+                transversal = transversal_columns(transversal)
+            f.write(bytes(transversal))
+            count += 1
+        # The count is only known at the end, so the header is rewritten.
+        f.seek(0)
+        write_header(f, n, square_hash(square), count)
+    return count
+
+
+class BinaryTransversals:
+    """
+    Read-only, memory-mapped view of a binary transversal file.
+
+    Indexing gives the column permutation of a transversal as a memoryview
+    of n bytes; cells() and triples() convert it to the forms the other
+    scripts use. Use as a context manager, or call close(), to unmap it.
+    """
+    __slots__ = ("n", "square_digest", "count", "_file", "_map", "_view")
+
+    def __init__(self, filename):
+        self._file = open(filename, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped.
+            self._file.close()
+            raise ValueError(f"{filename} is not a binary transversal file")
+        if len(self._map) < HEADER.size:
+            self.close()
+            raise ValueError(f"{filename} is not a binary transversal file")
+        magic, version, self.n, self.square_digest, self.count = HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{filename} is not a binary transversal file (version {VERSION})")
+        if len(self._map) != HEADER.size + self.count * self.n:
+            self.close()
+            raise ValueError(f"{filename} is truncated")
+        self._view = memoryview(self._map)[HEADER.size:]
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if not -self.count <= index < self.count:
+            raise IndexError("transversal index out of range")
+        index %= self.count
+        return self._view[index * self.n:(index + 1) * self.n]
+
+    def __iter__(self):
+        n = self.n
+        for start in range(0, self.count * n, n):
+            yield self._view[start:start + n]
+
+    def cells(self, index):
+        """Returns the transversal as a set of (row, col) cells."""
+        return set(enumerate(self[index]))
+
+    def triples(self, index, square):
+        """Returns the transversal as a list of (row, col, symbol)."""
+        return [(row, col, square[row][col]) for row, col in enumerate(self[index])]
+
+    def matches(self, square):
+        """Checks that the file was computed from the given square."""
+        return square_hash(square) == self.square_digest
+
+    def close(self):
+        if getattr(self, "_view", None) is not None:
+            self._view.release()
+            self._view = None
+        if getattr(self, "_map", None) is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def load_binary(filename):
+    return BinaryTransversals(filename)
+
+
+def is_binary(filename):
+    """Checks whether filename starts with the binary format's magic bytes."""
+    with open(filename, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def read_text(filename):
+    """
+    Yields the transversals of a text file, one list of (row, col, symbol)
+    per non-empty line.
+    """
+    with open(filename, "r") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield ast.literal_eval(line)
+
+
+def write_text(filename, transversals):
+    """
+    Writes transversals, given as lists of (row, col, symbol), in the text
+    format. Returns the count.
+    """
+    count = 0
+    with open(filename, "w") as f:
+        for transversal in transversals:
+            f.write(str(list(transversal)) + '\n')
+            count += 1
+    return count
+
+
+def text_to_binary(text_filename, binary_filename, square):
+    return write_binary(binary_filename, read_text(text_filename), square)
+
+
+def binary_to_text(binary_filename, text_filename, square):
+    with load_binary(binary_filename) as store:
+        if not store.matches(square):
+            raise ValueError(f"{binary_filename} was not computed from the given square")
+        return write_text(text_filename, (store.triples(i, square) for i in range(len(store))))
+
+
+class TextSink:
+    """
+    Buffered writer for the text format. Transversals are added as column
+    permutations and written in batches of batch_size lines. Anything in
+    the file after position (a byte offset returned by flush) is discarded,
+    so position=0 starts a new file and a saved position resumes one.
+    """
+
+    def __init__(self, filename, square, position=0, batch_size=4096):
+        self.square = square
+        self.batch_size = batch_size
+        self._buffer = []
+        self._file = open(filename, "r+" if position else "w")
+        self._file.truncate(position)
+        self._file.seek(position)
+
+    def add(self, columns):
+        square = self.square
+        self._buffer.append(str([(row, col, square[row][col]) for row, col in enumerate(columns)]))
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Writes out the buffer and returns the position to resume from."""
+        if self._buffer:
+            self._file.write('\n'.join(self._buffer) + '\n')
+            self._buffer = []
+        self._file.flush()
+        return self._file.tell()
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+
+class BinarySink:
+    """
+    Buffered writer for the binary format. The header count is rewritten on
+    every flush, so the file is valid whenever flush returns. position is a
+    number of records: later records are discarded and, when resuming, the
+    existing header must match the square.
+    """
+
+    def __init__(self, filename, square, position=0, batch_size=4096):
+        self.n = len(square)
+        self.digest = square_hash(square)
+        self.batch_size = batch_size
+        self.count = position
+        self._buffer = bytearray()
+        self._pending = 0
+        if position:
+            self._file = open(filename, "r+b")
+            _, _, n, digest, _ = HEADER.unpack(self._file.read(HEADER.size))
+            if n != self.n or digest != self.digest:
+                self._file.close()
+                raise ValueError(f"{filename} was not computed from the given square")
+        else:
+            self._file = open(filename, "w+b")
+        self._file.truncate(HEADER.size + position * self.n)
+        self._file.seek(HEADER.size + position * self.n)
+
+    def add(self, columns):
+        self._buffer += bytes(columns)
+        self._pending += 1
+        if self._pending >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Writes out the buffer and returns the position to resume from."""
+        self._file.write(self._buffer)
+        self.count += self._pending
+        self._buffer = bytearray()
+        self._pending = 0
+        end = self._file.tell()
+        self._file.seek(0)
+        write_header(self._file, self.n, self.digest, self.count)
+        self._file.seek(end)
+        self._file.flush()
+        return self.count
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+
+class CallbackSink:
+    """
+    Passes transversals to callback(batch) in lists of up to batch_size
+    column permutations. The position is the number delivered so far.
+    """
+
+    def __init__(self, callback, position=0, batch_size=4096):
+        self.callback = callback
+        self.batch_size = batch_size
+        self.count = position
+        self._buffer = []
+
+    def add(self, columns):
+        self._buffer.append(tuple(columns))
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            self.callback(self._buffer)
+            self.count += len(self._buffer)
+            self._buffer = []
+        return self.count
+
+    def close(self):
+        self.flush()